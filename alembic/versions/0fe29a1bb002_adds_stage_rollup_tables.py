@@ -0,0 +1,86 @@
+"""adds stage rollup tables
+
+Revision ID: 0fe29a1bb002
+Revises: cce6793149a0
+Create Date: 2026-10-17 00:52:39.371607
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0fe29a1bb002"
+down_revision: Union[str, None] = "cce6793149a0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "stats_daily",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("event_count", sa.BigInteger(), nullable=False),
+        sa.Column("magnitude_count", sa.BigInteger(), nullable=False),
+        sa.Column("magnitude_sum", sa.Float(), nullable=True),
+        sa.Column("magnitude_min", sa.Float(), nullable=True),
+        sa.Column("magnitude_max", sa.Float(), nullable=True),
+        sa.Column("depth_count", sa.BigInteger(), nullable=False),
+        sa.Column("depth_sum", sa.Float(), nullable=True),
+        sa.Column("first_dt", sa.DateTime(), nullable=True),
+        sa.Column("last_dt", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("day"),
+    )
+    op.create_table(
+        "stats_magnitude_bins",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("bin", sa.Integer(), nullable=False),
+        sa.Column("event_count", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("day", "bin"),
+    )
+    op.create_table(
+        "stats_region_daily",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("region_id", sa.Integer(), nullable=False),
+        sa.Column("event_count", sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["region_id"],
+            ["regions.id"],
+        ),
+        sa.PrimaryKeyConstraint("day", "region_id"),
+    )
+
+    # Roll up the rows already staged, as app.etl.stage_rollups does per day
+    op.execute("""
+        INSERT INTO stats_daily (
+            day, event_count, magnitude_count, magnitude_sum, magnitude_min,
+            magnitude_max, depth_count, depth_sum, first_dt, last_dt
+        )
+        SELECT
+            dt::date, COUNT(*), COUNT(magnitude), SUM(magnitude), MIN(magnitude),
+            MAX(magnitude), COUNT(depth), SUM(depth), MIN(dt), MAX(dt)
+        FROM stage_earthquakes
+        GROUP BY dt::date
+        """)
+    op.execute("""
+        INSERT INTO stats_region_daily (day, region_id, event_count)
+        SELECT dt::date, region_id, COUNT(*)
+        FROM stage_earthquakes
+        WHERE region_id IS NOT NULL
+        GROUP BY dt::date, region_id
+        """)
+    op.execute("""
+        INSERT INTO stats_magnitude_bins (day, bin, event_count)
+        SELECT dt::date, floor(magnitude::numeric / 0.1)::int AS bin, COUNT(*)
+        FROM stage_earthquakes
+        WHERE magnitude IS NOT NULL AND magnitude <> 'NaN'
+        GROUP BY dt::date, bin
+        """)
+
+
+def downgrade() -> None:
+    op.drop_table("stats_region_daily")
+    op.drop_table("stats_magnitude_bins")
+    op.drop_table("stats_daily")
@@ -0,0 +1,33 @@
+"""creates load_manifest table
+
+Revision ID: 43e1233393cd
+Revises: 857c40b6d958
+Create Date: 2026-10-17 00:16:25.076863
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "43e1233393cd"
+down_revision: Union[str, None] = "857c40b6d958"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "load_manifest",
+        sa.Column("checksum", sa.String(length=64), nullable=False),
+        sa.Column("file_name", sa.String(), nullable=True),
+        sa.Column("file_size", sa.BigInteger(), nullable=True),
+        sa.Column("loaded_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("checksum"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("load_manifest")
@@ -0,0 +1,60 @@
+"""adds incremental transform tracking
+
+Revision ID: 6f18b575e429
+Revises: ab7cd9280b54
+Create Date: 2026-10-17 00:52:37.904118
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "6f18b575e429"
+down_revision: Union[str, None] = "ab7cd9280b54"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "earthquakes",
+        sa.Column(
+            "change_xid",
+            sa.BigInteger(),
+            server_default=sa.text("pg_current_xact_id()::text::bigint"),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        op.f("ix_earthquakes_change_xid"), "earthquakes", ["change_xid"], unique=False
+    )
+    op.add_column(
+        "stage_earthquakes", sa.Column("earthquake_id", sa.Integer(), nullable=True)
+    )
+    op.create_index(
+        op.f("ix_stage_earthquakes_earthquake_id"),
+        "stage_earthquakes",
+        ["earthquake_id"],
+        unique=False,
+    )
+    op.create_table(
+        "transform_checkpoints",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("change_xid", sa.BigInteger(), nullable=True),
+        sa.Column("rows_transformed", sa.BigInteger(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("transform_checkpoints")
+    op.drop_index(
+        op.f("ix_stage_earthquakes_earthquake_id"), table_name="stage_earthquakes"
+    )
+    op.drop_column("stage_earthquakes", "earthquake_id")
+    op.drop_index(op.f("ix_earthquakes_change_xid"), table_name="earthquakes")
+    op.drop_column("earthquakes", "change_xid")
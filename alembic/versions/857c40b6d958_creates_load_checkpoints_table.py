@@ -0,0 +1,33 @@
+"""creates load_checkpoints table
+
+Revision ID: 857c40b6d958
+Revises: afa0abf1181b
+Create Date: 2026-10-17 00:12:57.843748
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "857c40b6d958"
+down_revision: Union[str, None] = "afa0abf1181b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "load_checkpoints",
+        sa.Column("file_name", sa.String(), nullable=False),
+        sa.Column("signature", sa.String(), nullable=True),
+        sa.Column("rows_loaded", sa.BigInteger(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("file_name"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("load_checkpoints")
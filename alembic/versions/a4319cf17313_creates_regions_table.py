@@ -0,0 +1,69 @@
+"""creates regions table
+
+Revision ID: a4319cf17313
+Revises: 6f18b575e429
+Create Date: 2026-10-17 01:05:48.217640
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "a4319cf17313"
+down_revision: Union[str, None] = "6f18b575e429"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "regions",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    op.add_column(
+        "stage_earthquakes", sa.Column("region_id", sa.Integer(), nullable=True)
+    )
+
+    # Move the staged region names into the dimension table
+    op.execute("""
+        INSERT INTO regions (name)
+        SELECT DISTINCT region FROM stage_earthquakes WHERE region IS NOT NULL
+        """)
+    op.execute("""
+        UPDATE stage_earthquakes s SET region_id = r.id
+        FROM regions r WHERE r.name = s.region
+        """)
+
+    op.create_foreign_key(None, "stage_earthquakes", "regions", ["region_id"], ["id"])
+    op.create_index(
+        op.f("ix_stage_earthquakes_region_id"),
+        "stage_earthquakes",
+        ["region_id"],
+        unique=False,
+    )
+    op.drop_column("stage_earthquakes", "region")
+
+
+def downgrade() -> None:
+    op.add_column(
+        "stage_earthquakes",
+        sa.Column("region", sa.String(length=255), nullable=True),
+    )
+    op.execute("""
+        UPDATE stage_earthquakes s SET region = r.name
+        FROM regions r WHERE r.id = s.region_id
+        """)
+    op.drop_index(
+        op.f("ix_stage_earthquakes_region_id"), table_name="stage_earthquakes"
+    )
+    op.drop_constraint(
+        "stage_earthquakes_region_id_fkey", "stage_earthquakes", type_="foreignkey"
+    )
+    op.drop_column("stage_earthquakes", "region_id")
+    op.drop_table("regions")
@@ -0,0 +1,44 @@
+"""adds earthquake time indexes
+
+Revision ID: ab7cd9280b54
+Revises: 43e1233393cd
+Create Date: 2026-10-17 00:40:12.318204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "ab7cd9280b54"
+down_revision: Union[str, None] = "43e1233393cd"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "earthquakes",
+        sa.Column(
+            "event_time",
+            sa.DateTime(timezone=True),
+            sa.Computed("to_timestamp(time / 1000.0)"),
+            nullable=True,
+        ),
+    )
+    op.create_index(op.f("ix_earthquakes_time"), "earthquakes", ["time"], unique=False)
+    op.create_index(
+        "ix_earthquakes_event_time_brin",
+        "earthquakes",
+        ["event_time"],
+        unique=False,
+        postgresql_using="brin",
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_earthquakes_event_time_brin", table_name="earthquakes")
+    op.drop_index(op.f("ix_earthquakes_time"), table_name="earthquakes")
+    op.drop_column("earthquakes", "event_time")
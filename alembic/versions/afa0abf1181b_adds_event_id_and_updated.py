@@ -0,0 +1,35 @@
+"""adds event_id and updated to earthquakes
+
+Revision ID: afa0abf1181b
+Revises: 2f5bc7613c97
+Create Date: 2026-10-17 00:10:12.418305
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "afa0abf1181b"
+down_revision: Union[str, None] = "2f5bc7613c97"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("earthquakes", sa.Column("event_id", sa.String(), nullable=True))
+    op.add_column("earthquakes", sa.Column("updated", sa.BigInteger(), nullable=True))
+    # Rows loaded before this migration have no event_id; NULLs never
+    # conflict, so they can stay alongside the upserted rows
+    op.create_index(
+        op.f("ix_earthquakes_event_id"), "earthquakes", ["event_id"], unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_earthquakes_event_id"), table_name="earthquakes")
+    op.drop_column("earthquakes", "updated")
+    op.drop_column("earthquakes", "event_id")
@@ -0,0 +1,42 @@
+"""backfills stage earthquake ids
+
+Revision ID: c27339066a0a
+Revises: 0fe29a1bb002
+Create Date: 2026-10-17 01:27:16.182272
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "c27339066a0a"
+down_revision: Union[str, None] = "0fe29a1bb002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Stage rows written before earthquake_id existed are matched to their
+    # earthquake on the raw time and position they were transformed from, so
+    # the incremental merge replaces them instead of adding a second row
+    op.execute("""
+        UPDATE stage_earthquakes s
+        SET earthquake_id = e.id
+        FROM (
+            SELECT DISTINCT ON (time, latitude, longitude) id, time, latitude, longitude
+            FROM earthquakes
+            ORDER BY time, latitude, longitude, id
+        ) e
+        WHERE s.earthquake_id IS NULL
+        AND s.raw_time = e.time
+        AND s.latitude IS NOT DISTINCT FROM e.latitude
+        AND s.longitude IS NOT DISTINCT FROM e.longitude
+        """)
+
+
+def downgrade() -> None:
+    # The ids are correct under the previous revision too
+    pass
@@ -0,0 +1,135 @@
+"""partitions stage_earthquakes by month
+
+Revision ID: cce6793149a0
+Revises: a4319cf17313
+Create Date: 2026-10-17 01:31:09.551873
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "cce6793149a0"
+down_revision: Union[str, None] = "a4319cf17313"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = (
+    "id, dt, place, magnitude, latitude, longitude, created_at, depth, "
+    "raw_time, earthquake_id, region_id"
+)
+
+INDEXED_COLUMNS = ["dt", "earthquake_id", "region_id"]
+
+
+def _stage_columns(dt_nullable):
+    return [
+        sa.Column(
+            "id",
+            sa.Integer(),
+            server_default=sa.text("nextval('stage_earthquakes_id_seq'::regclass)"),
+            nullable=False,
+        ),
+        sa.Column("dt", sa.DateTime(), nullable=dt_nullable),
+        sa.Column("place", sa.String(length=255), nullable=True),
+        sa.Column("magnitude", sa.Float(), nullable=True),
+        sa.Column("latitude", sa.Float(), nullable=True),
+        sa.Column("longitude", sa.Float(), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            server_default=sa.text("CURRENT_TIMESTAMP"),
+            nullable=True,
+        ),
+        sa.Column("depth", sa.Float(), nullable=True),
+        sa.Column("raw_time", sa.BigInteger(), nullable=True),
+        sa.Column("earthquake_id", sa.Integer(), nullable=True),
+        sa.Column("region_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["region_id"], ["regions.id"]),
+    ]
+
+
+def _set_aside_old_table():
+    """Rename stage_earthquakes out of the way, freeing its index names."""
+    op.rename_table("stage_earthquakes", "stage_earthquakes_old")
+    for column in INDEXED_COLUMNS:
+        op.drop_index(
+            op.f(f"ix_stage_earthquakes_{column}"), table_name="stage_earthquakes_old"
+        )
+    op.execute(
+        "ALTER TABLE stage_earthquakes_old "
+        "RENAME CONSTRAINT stage_earthquakes_pkey TO stage_earthquakes_old_pkey"
+    )
+
+
+def _replace_old_table():
+    """Copy the set-aside rows over and drop the old table, keeping the id sequence."""
+    op.execute(
+        f"INSERT INTO stage_earthquakes ({COLUMNS}) "
+        f"SELECT {COLUMNS.replace('dt,', 'COALESCE(dt, created_at),', 1)} "
+        "FROM stage_earthquakes_old"
+    )
+    op.execute("ALTER SEQUENCE stage_earthquakes_id_seq OWNED BY stage_earthquakes.id")
+    op.drop_table("stage_earthquakes_old")
+    for column in INDEXED_COLUMNS:
+        op.create_index(
+            op.f(f"ix_stage_earthquakes_{column}"),
+            "stage_earthquakes",
+            [column],
+            unique=False,
+        )
+
+
+def upgrade() -> None:
+    _set_aside_old_table()
+    op.create_table(
+        "stage_earthquakes",
+        *_stage_columns(dt_nullable=False),
+        sa.PrimaryKeyConstraint("id", "dt"),
+        postgresql_partition_by="RANGE (dt)",
+    )
+
+    # One partition per month from the oldest staged row to three months
+    # ahead, and a default partition for anything outside them
+    op.execute("""
+        DO $$
+        DECLARE
+            month date;
+        BEGIN
+            FOR month IN
+                SELECT generate_series(
+                    date_trunc('month', COALESCE(
+                        (SELECT min(COALESCE(dt, created_at)) FROM stage_earthquakes_old),
+                        now()
+                    )),
+                    date_trunc('month', now()) + interval '3 months',
+                    interval '1 month'
+                )::date
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF stage_earthquakes FOR VALUES FROM (%L) TO (%L)',
+                    'stage_earthquakes_' || to_char(month, '"y"YYYY"m"MM'),
+                    month,
+                    (month + interval '1 month')::date
+                );
+            END LOOP;
+        END $$
+        """)
+    op.execute(
+        "CREATE TABLE stage_earthquakes_default PARTITION OF stage_earthquakes DEFAULT"
+    )
+    _replace_old_table()
+
+
+def downgrade() -> None:
+    _set_aside_old_table()
+    op.create_table(
+        "stage_earthquakes",
+        *_stage_columns(dt_nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    # Dropping the partitioned table drops all of its partitions
+    _replace_old_table()
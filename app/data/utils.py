@@ -1,21 +1,72 @@
 from sqlalchemy.orm import sessionmaker
 import os
+import threading
+from contextlib import contextmanager
 from sqlalchemy import create_engine
 
+_engine = None
+_engine_pid = None
+_engine_lock = threading.Lock()
 
-# Database connection function
-def get_engine():
+Session = sessionmaker()
+
+
+def get_database_url():
     db_host = os.getenv("DB_HOST", "localhost")
     db_name = os.getenv("DB_NAME", "earthquake_db")
     db_user = os.getenv("DB_USER", "postgres")
     db_pass = os.getenv("DB_PASS", "postgres")
     db_port = os.getenv("DB_PORT", "5432")
 
-    db_url = f"postgresql://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}"
-    return create_engine(db_url)
+    return f"postgresql://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}"
+
+
+# Database connection function
+def get_engine():
+    """Return the engine shared by the whole process, creating it on first use.
+
+    The pool is tuned with DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_PRE_PING and
+    DB_POOL_RECYCLE, and DB_STATEMENT_TIMEOUT_MS caps every statement run on
+    its connections. A forked child process gets an engine of its own rather
+    than the parent's connections, and leaves those connections open.
+    """
+    global _engine, _engine_pid
+    with _engine_lock:
+        if _engine is None or _engine_pid != os.getpid():
+            if _engine is not None:
+                # Drop the parent's pool without closing its connections, which
+                # the parent still uses through the same sockets
+                _engine.dispose(close=False)
+
+            connect_args = {}
+            statement_timeout = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+            if statement_timeout:
+                connect_args["options"] = f"-c statement_timeout={statement_timeout}"
+
+            _engine = create_engine(
+                get_database_url(),
+                pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+                max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+                pool_pre_ping=os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+                pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+                connect_args=connect_args,
+            )
+            _engine_pid = os.getpid()
+        return _engine
 
 
 def get_session():
-    engine = get_engine()
-    Session = sessionmaker(bind=engine)
-    return Session()
+    return Session(bind=get_engine())
+
+
+@contextmanager
+def get_connection():
+    """Check out a raw psycopg2 connection from the shared engine's pool.
+
+    The connection goes back to the pool, rolled back, when the block exits.
+    """
+    conn = get_engine().raw_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
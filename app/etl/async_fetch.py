@@ -0,0 +1,240 @@
+import asyncio
+import gzip
+import logging
+import os
+import random
+import tempfile
+import time
+from datetime import timedelta
+
+from app.etl.http_cache import CachedBody
+from app.etl.usgs_fetch import (
+    MAX_EVENTS_PER_QUERY,
+    MIN_WINDOW,
+    RETRY_STATUSES,
+    USGS_API_URL,
+    WindowLimitExceeded,
+    build_query,
+    is_limit_error,
+    split_time_range,
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Async token-bucket rate limiter allowing `rate` requests per second.
+
+    Up to `capacity` requests may be made back to back before the rate applies.
+    Create it inside the running event loop.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def backoff_delay(attempt, base=1.0, cap=30.0):
+    """Return a full-jitter exponential backoff delay for the given retry attempt."""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+class _RetryableStatus(Exception):
+    """A transient HTTP status that should be retried after a backoff."""
+
+    def __init__(self, status, headers):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        retry_after = headers.get("Retry-After", "")
+        self.retry_after = float(retry_after) if retry_after.isdigit() else None
+
+
+class _AsyncFetcher:
+    """Shared state of one async fetch: session, rate limiter, cache and retry policy."""
+
+    def __init__(self, session, bucket, handler, params, url, cache, retries):
+        self.session = session
+        self.bucket = bucket
+        self.handler = handler
+        self.params = params
+        self.url = url
+        self.cache = cache
+        self.retries = retries
+
+    async def _write_body(self, response, path):
+        """Write the body gzip-compressed, keeping it as received if already gzipped."""
+        if response.headers.get("Content-Encoding", "").lower() == "gzip":
+            with open(path, "wb") as f:
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    f.write(chunk)
+        else:
+            with gzip.open(path, "wb") as f:
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    f.write(chunk)
+
+    async def _read_text(self, response):
+        body = await response.read()
+        if response.headers.get("Content-Encoding", "").lower() == "gzip":
+            body = gzip.decompress(body)
+        return body.decode("utf-8", errors="replace")
+
+    async def _request(self, start, end):
+        """Make one request for a window and save its body, returning a CachedBody."""
+        query = build_query(start, end, self.params)
+        headers = {"Accept-Encoding": "gzip"}
+        if self.cache is not None:
+            key = self.cache.key(self.url, query)
+            headers.update(self.cache.validators(key))
+
+        await self.bucket.acquire()
+        async with self.session.get(
+            self.url, params=query, headers=headers
+        ) as response:
+            if self.cache is not None and response.status == 304:
+                return self.cache.hit(key)
+            if response.status == 400:
+                text = await self._read_text(response)
+                if is_limit_error(response.status, text):
+                    raise WindowLimitExceeded(
+                        f"Window {start} to {end} exceeds {MAX_EVENTS_PER_QUERY} events"
+                    )
+            if response.status in RETRY_STATUSES:
+                raise _RetryableStatus(response.status, response.headers)
+            response.raise_for_status()
+
+            if self.cache is not None:
+                await self._write_body(response, self.cache.temp_path(key))
+                return self.cache.commit(key, self.url, response.headers)
+
+            fd, path = tempfile.mkstemp(suffix=".json.gz")
+            os.close(fd)
+            try:
+                await self._write_body(response, path)
+            except BaseException:
+                os.remove(path)
+                raise
+            return CachedBody(path, not_modified=False)
+
+    async def fetch_window(self, start, end):
+        """Fetch one window with retries, then run the handler on its body."""
+        import aiohttp
+
+        attempt = 0
+        while True:
+            try:
+                body = await self._request(start, end)
+                break
+            except (
+                aiohttp.ClientError,
+                asyncio.TimeoutError,
+                _RetryableStatus,
+            ) as e:
+                if isinstance(e, aiohttp.ClientResponseError) and e.status < 500:
+                    raise
+                if attempt >= self.retries:
+                    raise
+                delay = backoff_delay(attempt)
+                retry_after = getattr(e, "retry_after", None)
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+                attempt += 1
+                logger.warning(
+                    f"Retrying window {start} to {end} in {delay:.1f}s "
+                    f"(attempt {attempt} of {self.retries}): {e!r}"
+                )
+                await asyncio.sleep(delay)
+
+        try:
+            # Parsing is CPU-bound, so keep it off the event loop
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self.handler, body
+            )
+        finally:
+            if self.cache is None:
+                os.remove(body.path)
+
+    async def fetch_adaptive(self, start, end):
+        """Fetch a window, halving it until every piece fits under the event cap."""
+        try:
+            return [await self.fetch_window(start, end)]
+        except WindowLimitExceeded:
+            if end - start <= MIN_WINDOW:
+                raise
+            middle = start + (end - start) / 2
+            logger.info(
+                f"Window {start} to {end} hit the event cap, splitting at {middle}"
+            )
+            left, right = await asyncio.gather(
+                self.fetch_adaptive(start, middle), self.fetch_adaptive(middle, end)
+            )
+            return left + right
+
+
+async def fetch_time_range_async(
+    start,
+    end,
+    handler,
+    window=timedelta(days=1),
+    max_connections=8,
+    params=None,
+    url=USGS_API_URL,
+    cache=None,
+    rate=5.0,
+    retries=4,
+    timeout=60,
+):
+    """Fetch [start, end) as concurrent sub-windows on one pooled aiohttp session.
+
+    All windows are in flight at once, bounded by `max_connections` open
+    connections and `rate` requests per second. Each window is retried with
+    jittered exponential backoff on timeouts, connection errors and transient
+    statuses. `handler` receives each body the same way as with a response
+    cache in `usgs_fetch.fetch_time_range`, and the results are returned in
+    time order.
+    """
+    import aiohttp
+
+    windows = split_time_range(start, end, window)
+    logger.info(
+        f"Fetching {len(windows)} windows from {start} to {end} with up to "
+        f"{max_connections} connections at {rate} requests/s"
+    )
+
+    connector = aiohttp.TCPConnector(limit=max_connections)
+    client_timeout = aiohttp.ClientTimeout(total=timeout, sock_connect=10)
+    async with aiohttp.ClientSession(
+        connector=connector, timeout=client_timeout, auto_decompress=False
+    ) as session:
+        fetcher = _AsyncFetcher(
+            session, TokenBucket(rate), handler, params, url, cache, retries
+        )
+        batches = await asyncio.gather(
+            *(fetcher.fetch_adaptive(s, e) for s, e in windows)
+        )
+
+    return [result for batch in batches for result in batch]
+
+
+def fetch_time_range(start, end, handler, **kwargs):
+    """Blocking wrapper around `fetch_time_range_async` for synchronous callers."""
+    return asyncio.run(fetch_time_range_async(start, end, handler, **kwargs))
@@ -0,0 +1,126 @@
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.data.utils import get_connection
+from app.etl.file_formats import COLUMNS, FORMAT_EXTENSIONS, read_frame, write_frame
+from app.etl.load_data import copy_file_to_staging, create_staging_table
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def synthetic_earthquakes(rows, seed=42):
+    """Build a DataFrame shaped like an extract, with USGS-like value ranges."""
+    rng = np.random.default_rng(seed)
+    places = np.array(
+        [
+            "10 km NE of Ridgecrest, CA",
+            "Central Alaska",
+            "45 km SW of Suva, Fiji",
+            "South of the Fiji Islands",
+            "5 km S of Volcano, Hawaii",
+        ]
+    )
+    times = rng.integers(1_700_000_000_000, 1_701_300_000_000, rows)
+    return pd.DataFrame(
+        {
+            "event_id": [f"us{n:010d}" for n in range(rows)],
+            "time": times,
+            "updated": times + rng.integers(60_000, 86_400_000, rows),
+            "place": places[rng.integers(0, len(places), rows)],
+            "magnitude": rng.uniform(-1, 7, rows).round(2),
+            "longitude": rng.uniform(-180, 180, rows),
+            "latitude": rng.uniform(-90, 90, rows),
+            "depth": rng.uniform(0, 700, rows).round(3),
+            "file_name": "earthquake_data_benchmark",
+        },
+        columns=COLUMNS,
+    )
+
+
+def time_staging_copy(conn, path):
+    """Time the loader's COPY of an extract into its staging table, then roll it back."""
+    cur = conn.cursor()
+    try:
+        started = time.perf_counter()
+        create_staging_table(cur)
+        copy_file_to_staging(cur, path)
+        return time.perf_counter() - started
+    finally:
+        conn.rollback()
+        cur.close()
+
+
+def benchmark(df, directory, conn=None):
+    """Write and read `df` in every extract format, returning size and timings.
+
+    With a database connection, each file is also ingested the way the
+    loader does it, with COPY into the staging table, and `end_to_end_s`
+    is the extract write plus that ingest.
+    """
+    results = []
+    for fmt, extension in FORMAT_EXTENSIONS.items():
+        path = os.path.join(directory, f"earthquake_data_benchmark{extension}")
+
+        started = time.perf_counter()
+        write_frame(df, path, fmt)
+        write_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        loaded = read_frame(path)
+        read_seconds = time.perf_counter() - started
+
+        result = {
+            "format": fmt,
+            "size_mb": os.path.getsize(path) / (1024 * 1024),
+            "write_s": write_seconds,
+            "read_s": read_seconds,
+            "time_dtype": str(loaded["time"].dtype),
+        }
+        if conn is not None:
+            result["load_s"] = time_staging_copy(conn, path)
+            result["end_to_end_s"] = write_seconds + result["load_s"]
+        results.append(result)
+    return pd.DataFrame(results)
+
+
+def main():
+    """Compare file size and write, read and load time of the extract formats."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "--rows", type=int, default=500_000, help="synthetic rows to generate"
+    )
+    parser.add_argument(
+        "--input", help="benchmark an existing extract file instead of synthetic data"
+    )
+    parser.add_argument(
+        "--no-load",
+        action="store_true",
+        help="skip the staging COPY, e.g. without a database",
+    )
+    args = parser.parse_args()
+
+    df = read_frame(args.input) if args.input else synthetic_earthquakes(args.rows)
+    logger.info(f"Benchmarking extract formats with {len(df)} rows")
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.no_load:
+            results = benchmark(df, directory)
+        else:
+            with get_connection() as conn:
+                results = benchmark(df, directory, conn)
+
+    logger.info("Extract format benchmark:\n" + results.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import logging
+import os
+import time
+
+import pandas as pd
+
+from app.data.utils import get_connection
+from app.etl.transform_data import (
+    TRANSFORMS,
+    calculate_date_range,
+    delete_old_records,
+    ensure_stage_table_exists,
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def benchmark(conn, start_date, end_date, modes):
+    """Run each transform mode over the range and time it against the first.
+
+    Every run replaces the staged rows of the range, as a normal transform
+    run does, so the stage table ends up as the last mode left it. That the
+    modes stage the same rows is checked by tests/test_transform_parity.py.
+    """
+    results = []
+    for mode in modes:
+        delete_old_records(conn, start_date, end_date)
+
+        started = time.perf_counter()
+        rows = TRANSFORMS[mode](conn, start_date, end_date)
+        seconds = time.perf_counter() - started
+
+        results.append(
+            {
+                "mode": mode,
+                "rows": rows,
+                "seconds": seconds,
+                "rows_per_s": rows / max(seconds, 1e-9),
+            }
+        )
+
+    results = pd.DataFrame(results)
+    results["speedup"] = results["seconds"].iloc[0] / results["seconds"]
+    return results
+
+
+def main():
+    """Compare the run times of the transform modes."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "--days",
+        type=int,
+        default=int(os.getenv("PROCESS_DAYS", "15")),
+        help="days of data to transform, ending today",
+    )
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=list(TRANSFORMS),
+        default=["python"] + [mode for mode in TRANSFORMS if mode != "python"],
+        help="transform modes to run; speedups are relative to the first",
+    )
+    args = parser.parse_args()
+
+    start_date, end_date = calculate_date_range(args.days)
+    logger.info(f"Benchmarking transform modes from {start_date} to {end_date}")
+
+    with get_connection() as conn:
+        ensure_stage_table_exists(conn)
+        results = benchmark(conn, start_date, end_date, args.modes)
+
+    logger.info("Transform benchmark:\n" + results.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
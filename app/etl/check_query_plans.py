@@ -0,0 +1,152 @@
+import argparse
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+
+from app.data.utils import get_connection
+from app.etl.stage_partitions import DEFAULT_PARTITION, add_months, month_partitions
+from app.etl.transform_data import (
+    FETCH_SQL,
+    INCREMENTAL_MERGE_SQL,
+    TRANSFORM_INSERT_SQL,
+    calculate_date_range,
+    get_transform_checkpoint,
+    xid_horizon,
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Transform queries, and the earthquakes column whose filter they must
+# answer from an index: a time range, or the incremental change_xid mark
+QUERIES = {
+    "fetch": (FETCH_SQL, "time"),
+    "sql_transform": (TRANSFORM_INSERT_SQL, "time"),
+    "incremental_merge": (INCREMENTAL_MERGE_SQL, "change_xid"),
+}
+
+# Queries on a dt range of stage_earthquakes that must only touch its partitions
+STAGE_QUERIES = {
+    "stage_delete": "DELETE FROM stage_earthquakes WHERE dt >= %s AND dt < %s",
+    "stage_read": "SELECT * FROM stage_earthquakes WHERE dt >= %s AND dt < %s",
+}
+
+
+def _plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def _explain(conn, query, params, seqscan=True):
+    """Return the nodes of the plan of `query`, without running it."""
+    cur = conn.cursor()
+    try:
+        if not seqscan:
+            cur.execute("SET LOCAL enable_seqscan = off")
+        cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+        plan = cur.fetchone()[0]
+    finally:
+        conn.rollback()
+        cur.close()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return list(_plan_nodes(plan[0]["Plan"]))
+
+
+def check_plan(conn, query, params, column="time"):
+    """Return the problems found in the plan of `query`, an empty list when none.
+
+    Sequential scans are disabled while planning, so a plan that still
+    scans earthquakes sequentially, or reads it without an index condition
+    on `column`, means the filter cannot use an index at all.
+    """
+    nodes = _explain(conn, query, params, seqscan=False)
+    problems = [
+        f"{node['Node Type']} on earthquakes"
+        for node in nodes
+        if node["Node Type"] == "Seq Scan"
+        and node.get("Relation Name") == "earthquakes"
+    ]
+    if not any(column in node.get("Index Cond", "") for node in nodes):
+        problems.append(f"no index condition on earthquakes.{column}")
+    return problems
+
+
+def check_pruning(conn, query, params):
+    """Return the stage_earthquakes partitions `query` reads outside its dt range.
+
+    Only the monthly partitions overlapping the range may be scanned, and
+    the default partition only when a month of the range has no partition.
+    """
+    start, end = params
+    cur = conn.cursor()
+    partitions = month_partitions(cur)
+    conn.rollback()
+    cur.close()
+
+    expected = set()
+    month = start.date().replace(day=1)
+    while datetime.combine(month, datetime.min.time()) < end:
+        expected.add(partitions.get(month, DEFAULT_PARTITION))
+        month = add_months(month, 1)
+
+    scanned = {
+        node["Relation Name"]
+        for node in _explain(conn, query, params)
+        if node.get("Relation Name", "").startswith("stage_earthquakes_")
+    }
+    return sorted(scanned - expected)
+
+
+def main():
+    """Check that the transform queries use the time index and partition pruning."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "--days",
+        type=int,
+        default=int(os.getenv("PROCESS_DAYS", "15")),
+        help="days of data in the checked range, ending today",
+    )
+    args = parser.parse_args()
+
+    start_date, end_date = calculate_date_range(args.days)
+    params = (
+        datetime.fromisoformat(start_date),
+        datetime.fromisoformat(end_date) + timedelta(days=1),
+    )
+
+    failed = False
+    with get_connection() as conn:
+        # Plan the merge for the mark the next incremental run starts from
+        mark = get_transform_checkpoint(conn)
+        if mark is None:
+            mark = xid_horizon(conn)
+        conn.rollback()
+        query_params = {"time": params, "change_xid": (mark,)}
+
+        for name, (query, column) in QUERIES.items():
+            problems = check_plan(conn, query, query_params[column], column)
+            if problems:
+                failed = True
+                logger.error(f"{name} query plan: {', '.join(problems)}")
+            else:
+                logger.info(f"{name} query plan uses the {column} index")
+        for name, query in STAGE_QUERIES.items():
+            extra = check_pruning(conn, query, params)
+            if extra:
+                failed = True
+                logger.error(f"{name} query plan also scans {', '.join(extra)}")
+            else:
+                logger.info(f"{name} query plan only scans the partitions of its range")
+
+    if failed:
+        raise SystemExit("Transform queries do not use their indexes or partitions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+
+from app.etl.stage_rollups import MAGNITUDE_BIN_WIDTH
+
+# Bars of the dashboard magnitude histogram
+HISTOGRAM_BINS = 20
+
+# Largest span, in days, charted with each count period
+COUNT_PERIODS = [(92, "day"), (730, "week"), (None, "month")]
+
+
+def _frame(conn, query, params, columns):
+    cur = conn.cursor()
+    cur.execute(query, params)
+    frame = pd.DataFrame(cur.fetchall(), columns=columns)
+    cur.close()
+    return frame
+
+
+def magnitude_histogram(conn, bins=HISTOGRAM_BINS):
+    """Return (edges, counts) of the magnitude distribution of every staged event.
+
+    The 0.1-magnitude rollup bins are grouped into at most `bins` bars with
+    width_bucket. The bar edges are whole numbers of rollup bins, so every
+    rollup bin falls in exactly one bar.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT MIN(bin), MAX(bin) + 1 FROM stats_magnitude_bins")
+    low, high = cur.fetchone()
+    cur.close()
+    if low is None:
+        return np.array([]), np.array([])
+
+    step = -(-(high - low) // bins)
+    bins = -(-(high - low) // step)
+    counts = _frame(
+        conn,
+        """
+        SELECT width_bucket(bin::numeric, %(low)s, %(high)s, %(bins)s) AS bar,
+               SUM(event_count)::bigint AS events
+        FROM stats_magnitude_bins
+        GROUP BY bar
+        """,
+        {"low": low, "high": low + step * bins, "bins": bins},
+        ["bar", "events"],
+    )
+    histogram = np.zeros(bins, dtype=np.int64)
+    histogram[counts["bar"].to_numpy() - 1] = counts["events"].to_numpy()
+    edges = (low + step * np.arange(bins + 1)) * MAGNITUDE_BIN_WIDTH
+    return edges, histogram
+
+
+def magnitude_median(conn):
+    """Return the median magnitude, interpolated within its 0.1-magnitude rollup bin."""
+    bins = _frame(
+        conn,
+        """
+        SELECT bin, SUM(event_count)::bigint
+        FROM stats_magnitude_bins
+        GROUP BY bin
+        ORDER BY bin
+        """,
+        None,
+        ["bin", "events"],
+    )
+    if bins.empty:
+        return None
+    cumulative = bins["events"].cumsum().to_numpy()
+    half = cumulative[-1] / 2
+    index = int(np.searchsorted(cumulative, half))
+    before = cumulative[index - 1] if index else 0
+    fraction = (half - before) / bins["events"].iloc[index]
+    return (bins["bin"].iloc[index] + fraction) * MAGNITUDE_BIN_WIDTH
+
+
+def count_period(first, last):
+    """Return the date_trunc unit for charting event counts from `first` to `last`."""
+    span = (last - first).days
+    for max_days, unit in COUNT_PERIODS:
+        if max_days is None or span <= max_days:
+            return unit
+
+
+def event_counts(conn, unit="day"):
+    """Return the staged events per `unit` ("day", "week" or "month") as a date/count frame."""
+    counts = _frame(
+        conn,
+        """
+        SELECT date_trunc(%s, day)::date AS date, SUM(event_count)::bigint AS count
+        FROM stats_daily
+        GROUP BY 1
+        ORDER BY 1
+        """,
+        (unit,),
+        ["date", "count"],
+    )
+    counts["date"] = pd.to_datetime(counts["date"])
+    return counts
+
+
+def density_grid(conn, cell_degrees=1.0):
+    """Return the staged events per latitude/longitude cell, located at the cell centres.
+
+    There are at most 180 / `cell_degrees` * 360 / `cell_degrees` cells,
+    however many events are staged.
+    """
+    return _frame(
+        conn,
+        """
+        SELECT (floor(latitude / %(cell)s) + 0.5) * %(cell)s,
+               (floor(longitude / %(cell)s) + 0.5) * %(cell)s,
+               COUNT(*),
+               MAX(magnitude)
+        FROM stage_earthquakes
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+        GROUP BY 1, 2
+        """,
+        {"cell": cell_degrees},
+        ["latitude", "longitude", "events", "max_magnitude"],
+    )
+
+
+def depth_magnitude_grid(conn, depth_step=10, magnitude_step=0.2):
+    """Return the staged events per depth/magnitude cell, located at the cell centres."""
+    return _frame(
+        conn,
+        """
+        SELECT (floor(depth / %(depth)s) + 0.5) * %(depth)s,
+               (floor(magnitude / %(magnitude)s) + 0.5) * %(magnitude)s,
+               COUNT(*)
+        FROM stage_earthquakes
+        WHERE depth IS NOT NULL AND magnitude IS NOT NULL
+        GROUP BY 1, 2
+        """,
+        {"depth": depth_step, "magnitude": magnitude_step},
+        ["depth", "magnitude", "events"],
+    )
+
+
+def depth_magnitude_regression(conn):
+    """Return the least-squares fit of magnitude on depth over every staged event.
+
+    Returns a dict of slope, intercept, r2 and the depth range, with None
+    values when there are fewer than two events.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT regr_slope(magnitude, depth), regr_intercept(magnitude, depth),
+               regr_r2(magnitude, depth), MIN(depth), MAX(depth)
+        FROM stage_earthquakes
+        WHERE depth IS NOT NULL AND magnitude IS NOT NULL
+        """)
+    row = cur.fetchone()
+    cur.close()
+    return dict(zip(["slope", "intercept", "r2", "min_depth", "max_depth"], row))
+
+
+def latest_events(conn, limit):
+    """Return the `limit` most recent staged events, for the map markers."""
+    return _frame(
+        conn,
+        """
+        SELECT s.dt, r.name AS region, s.place, s.magnitude, s.latitude,
+               s.longitude, s.depth
+        FROM stage_earthquakes s
+        LEFT JOIN regions r ON r.id = s.region_id
+        ORDER BY s.dt DESC
+        LIMIT %s
+        """,
+        (limit,),
+        ["dt", "region", "place", "magnitude", "latitude", "longitude", "depth"],
+    )
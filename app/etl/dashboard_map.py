@@ -0,0 +1,122 @@
+import html
+import json
+
+import numpy as np
+import pandas as pd
+
+# Decimals kept in the marker data: about 10 m for coordinates
+COORDINATE_DECIMALS = 4
+VALUE_DECIMALS = 2
+
+# Creates one marker per data row of the cluster layer. Rows are
+# [latitude, longitude, magnitude, depth, epoch seconds, place, region], the
+# last two being indexes into the name lists, and popups are only put
+# together when they are opened.
+_MARKER_CALLBACK = """(function () {
+    var places = %(places)s;
+    var regions = %(regions)s;
+    var icons = {};
+    function icon(magnitude) {
+        var color = magnitude < 2.0 ? "green" : magnitude < 4.0 ? "orange" : "red";
+        if (!(color in icons)) {
+            icons[color] = L.AwesomeMarkers.icon(
+                {icon: "bolt", prefix: "fa", markerColor: color}
+            );
+        }
+        return icons[color];
+    }
+    function popup(row) {
+        var date = new Date(row[4] * 1000).toISOString().slice(0, 19).replace("T", " ");
+        return "<b>Location:</b> " + places[row[5]] + "<br>" +
+            "<b>Region:</b> " + regions[row[6]] + "<br>" +
+            "<b>Date:</b> " + date + "<br>" +
+            "<b>Magnitude:</b> " + row[2] + "<br>" +
+            "<b>Depth:</b> " + row[3] + " km";
+    }
+    return function (row) {
+        var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon(row[2])});
+        marker.bindPopup(function () { return popup(row); }, {maxWidth: 300});
+        return marker;
+    };
+})()"""
+
+
+def _names(values):
+    """Factorize string values into (codes, HTML-escaped JSON list of the distinct names)."""
+    codes, names = pd.factorize(values.fillna("Unknown").astype(str))
+    return codes, json.dumps([html.escape(name) for name in names])
+
+
+def marker_data(events):
+    """Encode events as compact marker rows for the clustered layer.
+
+    Returns (rows, callback): plain lists with rounded numbers and place
+    and region codes, and the JavaScript callback holding the names they
+    refer to. Events without coordinates are left out.
+    """
+    events = events.dropna(subset=["latitude", "longitude"])
+    place_codes, places = _names(events["place"])
+    region_codes, regions = _names(events["region"])
+
+    # Naive timestamps are encoded as if UTC, so the popups show them unchanged
+    seconds = pd.to_datetime(events["dt"]).to_numpy().astype("datetime64[s]")
+    columns = [
+        events["latitude"].round(COORDINATE_DECIMALS),
+        events["longitude"].round(COORDINATE_DECIMALS),
+        events["magnitude"].round(VALUE_DECIMALS),
+        events["depth"].round(VALUE_DECIMALS),
+        pd.Series(seconds.astype(np.int64), index=events.index),
+        pd.Series(place_codes, index=events.index),
+        pd.Series(region_codes, index=events.index),
+    ]
+    frame = pd.concat(columns, axis=1).astype(object)
+    rows = frame.where(frame.notna(), None).to_numpy().tolist()
+    return rows, _MARKER_CALLBACK % {"places": places, "regions": regions}
+
+
+def heat_points(grid):
+    """Return [latitude, longitude, weight] points of a density grid from `density_grid`.
+
+    Cells are weighted by the log of their event count, scaled to at most
+    1, so that busy cells do not drown the rest.
+    """
+    weights = np.log1p(grid["events"].to_numpy(dtype=float))
+    if len(weights):
+        weights = np.round(weights / weights.max(), 3)
+    return np.column_stack(
+        [grid["latitude"].to_numpy(), grid["longitude"].to_numpy(), weights]
+    ).tolist()
+
+
+def build_map(events, heat_grid):
+    """Build the interactive earthquake map of `events` and the `heat_grid` density.
+
+    The heatmap comes from the aggregated grid and the events are one
+    compact data array clustered in the browser, instead of a marker and
+    popup object per event in the page.
+    """
+    import folium
+    from folium.plugins import FastMarkerCluster, HeatMap, MeasureControl
+
+    # Start map centered at median location
+    center = [events["latitude"].median(), events["longitude"].median()]
+    if pd.isna(center).any():
+        center = [0, 0]
+    m = folium.Map(location=center, zoom_start=3, tiles="CartoDB positron")
+
+    # Add measure tool
+    m.add_child(MeasureControl())
+
+    HeatMap(
+        heat_points(heat_grid),
+        radius=15,
+        blur=10,
+        gradient={0.4: "blue", 0.65: "lime", 0.9: "orange", 1: "red"},
+    ).add_to(m)
+
+    rows, callback = marker_data(events)
+    FastMarkerCluster(rows, callback=callback, name="Earthquakes").add_to(m)
+
+    # Add layer control
+    folium.LayerControl().add_to(m)
+    return m
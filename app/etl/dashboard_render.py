@@ -0,0 +1,264 @@
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Resolution of the dashboard charts
+CHART_DPI = 300
+
+
+def share(data_dir, name, data):
+    """Write an array, or a frame as a record array, to `name`.npy under `data_dir`.
+
+    String columns are stored as fixed-width unicode, with missing values
+    as empty strings, so that every dataset can be memory-mapped.
+    """
+    if isinstance(data, pd.DataFrame):
+        arrays = []
+        for column in data.columns:
+            values = data[column]
+            if values.dtype == object or pd.api.types.is_string_dtype(values.dtype):
+                arrays.append(values.fillna("").astype(str).to_numpy(dtype=str))
+            else:
+                arrays.append(values.to_numpy())
+        data = np.rec.fromarrays(arrays, names=list(data.columns))
+    np.save(os.path.join(data_dir, f"{name}.npy"), np.asarray(data))
+
+
+def load(data_dir, name):
+    """Memory-map a dataset written by `share`, returning record arrays as frames."""
+    data = np.load(os.path.join(data_dir, f"{name}.npy"), mmap_mode="r")
+    if data.dtype.names is None:
+        return data
+    frame = pd.DataFrame({column: data[column] for column in data.dtype.names})
+    for column in data.dtype.names:
+        if data.dtype[column].kind == "U":
+            frame[column] = frame[column].astype(object).mask(frame[column] == "")
+    return frame
+
+
+def _pyplot():
+    import matplotlib
+
+    matplotlib.use("Agg")  # Use non-interactive backend
+    import matplotlib.pyplot as plt
+
+    return plt
+
+
+def render_magnitude_histogram(data_dir, path, mean, median):
+    """Draw the magnitude histogram bars with the mean and median magnitudes."""
+    plt = _pyplot()
+    edges = load(data_dir, "magnitude_edges")
+    histogram = load(data_dir, "magnitude_counts")
+
+    plt.figure(figsize=(10, 6))
+    plt.bar(
+        edges[:-1],
+        histogram,
+        width=np.diff(edges),
+        align="edge",
+        color="skyblue",
+        edgecolor="black",
+        alpha=0.7,
+    )
+    plt.title("Earthquake Magnitude Distribution", fontsize=16)
+    plt.xlabel("Magnitude", fontsize=14)
+    plt.ylabel("Frequency", fontsize=14)
+    plt.grid(True, alpha=0.3, linestyle="--")
+
+    # Add mean and median lines
+    plt.axvline(mean, color="r", linestyle="--", label=f"Mean: {mean:.2f}")
+    plt.axvline(median, color="g", linestyle="--", label=f"Median: {median:.2f}")
+    plt.legend()
+
+    plt.savefig(path, dpi=CHART_DPI, bbox_inches="tight")
+    plt.close()
+
+
+def render_event_counts(data_dir, path, period):
+    """Draw the event counts per `period` with a 3-period moving average."""
+    plt = _pyplot()
+    counts = load(data_dir, "event_counts")
+
+    plt.figure(figsize=(12, 6))
+    plt.plot(
+        counts["date"],
+        counts["count"],
+        marker="o",
+        linestyle="-",
+        linewidth=2,
+        markersize=8,
+        color="#1f77b4",
+    )
+
+    # Add 3-period moving average
+    if len(counts) >= 3:
+        counts["moving_avg"] = counts["count"].rolling(window=3).mean()
+        plt.plot(
+            counts["date"],
+            counts["moving_avg"],
+            color="red",
+            linestyle="--",
+            linewidth=2,
+            label=f"3-{period} Moving Average",
+        )
+        plt.legend()
+
+    period_title = {"day": "Daily", "week": "Weekly", "month": "Monthly"}[period]
+    plt.title(f"{period_title} Earthquake Counts", fontsize=16)
+    plt.xlabel("Date", fontsize=14)
+    plt.ylabel("Number of Earthquakes", fontsize=14)
+    plt.grid(True, alpha=0.3, linestyle="--")
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+
+    # Add annotations for days with highest counts
+    if not counts.empty:
+        max_count_idx = counts["count"].idxmax()
+        max_date = counts.loc[max_count_idx, "date"]
+        max_count = counts.loc[max_count_idx, "count"]
+        plt.annotate(
+            f"Peak: {max_count}",
+            xy=(max_date, max_count),
+            xytext=(0, 20),
+            textcoords="offset points",
+            arrowprops=dict(arrowstyle="->", color="black"),
+            ha="center",
+        )
+
+    plt.savefig(path, dpi=CHART_DPI, bbox_inches="tight")
+    plt.close()
+
+
+def render_depth_magnitude(data_dir, path, regression):
+    """Draw the depth/magnitude grid with the regression line of magnitude on depth."""
+    plt = _pyplot()
+    grid = load(data_dir, "depth_grid")
+
+    plt.figure(figsize=(10, 6))
+
+    # One point per depth/magnitude cell, larger for busier cells
+    scatter = plt.scatter(
+        grid["depth"],
+        grid["magnitude"],
+        alpha=0.7,
+        c=grid["depth"],
+        s=20 * np.log1p(grid["events"]),  # Size based on event count
+        cmap="viridis",
+    )
+
+    plt.colorbar(scatter, label="Depth (km)")
+    plt.title("Earthquake Depth vs Magnitude", fontsize=16)
+    plt.xlabel("Depth (km)", fontsize=14)
+    plt.ylabel("Magnitude", fontsize=14)
+    plt.grid(True, alpha=0.3, linestyle="--")
+
+    # Add the regression line fitted in PostgreSQL over every event
+    if regression["slope"] is not None:
+        x_line = np.array([regression["min_depth"], regression["max_depth"]])
+        y_line = regression["slope"] * x_line + regression["intercept"]
+        plt.plot(
+            x_line,
+            y_line,
+            color="red",
+            linestyle="--",
+            label=f"Regression (r²={regression['r2']:.2f})",
+        )
+        plt.legend()
+
+    plt.savefig(path, dpi=CHART_DPI, bbox_inches="tight")
+    plt.close()
+
+
+def render_map(data_dir, path):
+    """Build and save the interactive map of the latest events and the density grid."""
+    from app.etl.dashboard_map import build_map
+
+    build_map(load(data_dir, "events"), load(data_dir, "heat_grid")).save(path)
+
+
+# Dashboard artifacts, by file name, and the functions rendering them
+RENDERERS = {
+    "magnitude_distribution.png": render_magnitude_histogram,
+    "daily_counts.png": render_event_counts,
+    "depth_vs_magnitude.png": render_depth_magnitude,
+    "earthquake_map.html": render_map,
+}
+
+
+def render_artifact(artifact, data_dir, viz_dir, params):
+    """Render one artifact, returning its timing and any error instead of raising."""
+    started = time.perf_counter()
+    try:
+        RENDERERS[artifact](data_dir, os.path.join(viz_dir, artifact), **params)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        logger.error(f"Failed to render {artifact}: {traceback.format_exc()}")
+    return {
+        "artifact": artifact,
+        "seconds": round(time.perf_counter() - started, 3),
+        "pid": os.getpid(),
+        "error": error,
+    }
+
+
+def render_artifacts(viz_dir, datasets, jobs, workers=1):
+    """Render the dashboard artifacts of `jobs` into `viz_dir`, each as its own job.
+
+    `datasets` are shared with the jobs through memory-mapped .npy files in
+    a temporary directory, and `jobs` maps artifact names to the parameters
+    of their renderer. With several `workers` the jobs run in a process
+    pool. A failed artifact does not stop the others; the results, in
+    `jobs` order, carry each artifact's run time and error, if any.
+    """
+    with tempfile.TemporaryDirectory(dir=viz_dir) as data_dir:
+        for name, data in datasets.items():
+            share(data_dir, name, data)
+
+        if workers > 1:
+            # Spawned rather than forked, so that workers start without the
+            # task process's threads and open connections
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(jobs)),
+                mp_context=multiprocessing.get_context("spawn"),
+            ) as executor:
+                futures = {
+                    artifact: executor.submit(
+                        render_artifact, artifact, data_dir, viz_dir, params
+                    )
+                    for artifact, params in jobs.items()
+                }
+                results = []
+                for artifact, future in futures.items():
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        # The worker process itself died
+                        results.append(
+                            {
+                                "artifact": artifact,
+                                "seconds": None,
+                                "pid": None,
+                                "error": f"{type(e).__name__}: {e}",
+                            }
+                        )
+        else:
+            results = [
+                render_artifact(artifact, data_dir, viz_dir, params)
+                for artifact, params in jobs.items()
+            ]
+    return results
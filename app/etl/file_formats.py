@@ -0,0 +1,233 @@
+import csv
+import logging
+import os
+import shutil
+
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Column order of the extracted earthquake files
+COLUMNS = [
+    "event_id",
+    "time",
+    "updated",
+    "place",
+    "magnitude",
+    "longitude",
+    "latitude",
+    "depth",
+    "file_name",
+]
+
+# Supported extract formats and their file extensions
+FORMAT_EXTENSIONS = {
+    "csv": ".csv",
+    "parquet": ".parquet",
+    "arrow-ipc": ".arrow",
+}
+
+
+def format_for_path(path):
+    """Return the extract format of a file from its extension."""
+    extension = os.path.splitext(path)[1]
+    for fmt, fmt_extension in FORMAT_EXTENSIONS.items():
+        if extension == fmt_extension:
+            return fmt
+    raise ValueError(f"Unsupported extract file type: {path}")
+
+
+def arrow_schema():
+    """Return the typed Arrow schema of the extracted earthquake columns."""
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("event_id", pa.string()),
+            ("time", pa.int64()),
+            ("updated", pa.int64()),
+            ("place", pa.string()),
+            ("magnitude", pa.float64()),
+            ("longitude", pa.float64()),
+            ("latitude", pa.float64()),
+            ("depth", pa.float64()),
+            ("file_name", pa.string()),
+        ]
+    )
+
+
+class _ColumnarWriter:
+    """Write Arrow record batches to a zstd-compressed Parquet or Arrow IPC file."""
+
+    def __init__(self, path, fmt):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = arrow_schema()
+        if fmt == "parquet":
+            self._writer = pq.ParquetWriter(path, schema, compression="zstd")
+        else:
+            self._writer = pa.ipc.new_file(
+                path, schema, options=pa.ipc.IpcWriteOptions(compression="zstd")
+            )
+        self._fmt = fmt
+
+    def write_batch(self, batch):
+        if self._fmt == "parquet":
+            self._writer.write_batch(batch)
+        else:
+            self._writer.write(batch)
+
+    def close(self):
+        self._writer.close()
+
+
+def write_frame(df, path, fmt):
+    """Write a DataFrame of extracted rows in the given format."""
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+        return
+
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(
+        df[COLUMNS], schema=arrow_schema(), preserve_index=False
+    )
+    writer = _ColumnarWriter(path, fmt)
+    try:
+        for batch in table.to_batches():
+            writer.write_batch(batch)
+    finally:
+        writer.close()
+
+
+def combine_csv_parts(part_paths, path, fmt):
+    """Combine headerless CSV part files, in order, into one extract file.
+
+    Columnar output is converted batch by batch, so memory stays bounded by
+    the reader block size rather than the size of the parts.
+    """
+    if fmt == "csv":
+        with open(path, "w", newline="") as out:
+            csv.writer(out).writerow(COLUMNS)
+            for part_path in part_paths:
+                with open(part_path, newline="") as part:
+                    shutil.copyfileobj(part, out)
+        return
+
+    import pyarrow.csv as pv
+
+    schema = arrow_schema()
+    read_options = pv.ReadOptions(column_names=COLUMNS)
+    convert_options = pv.ConvertOptions(column_types=schema, strings_can_be_null=True)
+    writer = _ColumnarWriter(path, fmt)
+    try:
+        for part_path in part_paths:
+            if os.path.getsize(part_path) == 0:
+                continue
+            reader = pv.open_csv(
+                part_path, read_options=read_options, convert_options=convert_options
+            )
+            for batch in reader:
+                writer.write_batch(batch)
+    finally:
+        writer.close()
+
+
+def read_frame(path):
+    """Read an extract file into a DataFrame; columnar formats skip text parsing."""
+    fmt = format_for_path(path)
+    if fmt == "csv":
+        return pd.read_csv(path)
+    if fmt == "parquet":
+        return pd.read_parquet(path)
+
+    import pyarrow as pa
+
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).read_pandas()
+
+
+def _conform_batch(batch, schema):
+    """Return `batch` with exactly the schema columns, adding NULLs for missing ones."""
+    import pyarrow as pa
+
+    columns = []
+    for field in schema:
+        index = batch.schema.get_field_index(field.name)
+        if index == -1:
+            columns.append(pa.nulls(batch.num_rows, type=field.type))
+        else:
+            columns.append(batch.column(index).cast(field.type))
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def iter_record_batches(path, batch_size=64 * 1024):
+    """Yield an extract file as Arrow record batches conforming to `arrow_schema()`.
+
+    Files are read incrementally, so memory is bounded by the batch size.
+    Extracts written before a column existed get NULLs for it.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pv
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema()
+    fmt = format_for_path(path)
+    if fmt == "csv":
+        reader = pv.open_csv(
+            path,
+            read_options=pv.ReadOptions(block_size=1 << 20),
+            convert_options=pv.ConvertOptions(
+                column_types=schema, strings_can_be_null=True
+            ),
+        )
+        batches = iter(reader)
+    elif fmt == "parquet":
+        batches = pq.ParquetFile(path).iter_batches(batch_size=batch_size)
+    else:
+        source = pa.memory_map(path)
+        ipc_reader = pa.ipc.open_file(source)
+        batches = (
+            ipc_reader.get_batch(i) for i in range(ipc_reader.num_record_batches)
+        )
+
+    for batch in batches:
+        yield _conform_batch(batch, schema)
+
+
+def iter_frames(path, chunk_size):
+    """Yield an extract file as DataFrames of at most `chunk_size` rows.
+
+    Only one chunk is held in memory at a time. CSV extracts are read with
+    pandas alone, without needing pyarrow.
+    """
+    if format_for_path(path) == "csv":
+        yield from pd.read_csv(path, chunksize=chunk_size)
+        return
+
+    for batch in iter_record_batches(path, batch_size=chunk_size):
+        for offset in range(0, batch.num_rows, chunk_size):
+            yield batch.slice(offset, chunk_size).to_pandas()
+
+
+def drop_superseded(df):
+    """Keep only the latest version (by `updated`) of each event_id.
+
+    Rows without an event_id cannot be matched, so only exact duplicates of
+    them are dropped.
+    """
+    with_id = df[df["event_id"].notna()]
+    without_id = df[df["event_id"].isna()]
+    return pd.concat(
+        [
+            with_id.sort_values("updated", kind="stable").drop_duplicates(
+                "event_id", keep="last"
+            ),
+            without_id.drop_duplicates(),
+        ]
+    )
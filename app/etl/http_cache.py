@@ -0,0 +1,142 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from urllib.parse import urlencode
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+class CachedBody:
+    """A gzip-compressed response body on disk that stands in for a requests Response."""
+
+    def __init__(self, path, not_modified):
+        self.path = path
+        self.not_modified = not_modified
+
+    def iter_content(self, chunk_size=64 * 1024):
+        with gzip.open(self.path, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def json(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+
+class ResponseCache:
+    """On-disk cache of compressed response bodies keyed by request URL and parameters.
+
+    Entries keep the ETag and Last-Modified validators of the response so
+    later requests can be made conditional. Eviction is least-recently-used
+    by total size, after dropping entries older than `max_age` seconds.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024, max_age=7 * 86400):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, url, params):
+        request = f"{url}?{urlencode(sorted(params.items()))}"
+        return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+    def _body_path(self, key):
+        return os.path.join(self.directory, f"{key}.json.gz")
+
+    def _meta_path(self, key):
+        return os.path.join(self.directory, f"{key}.meta.json")
+
+    def validators(self, key):
+        """Return conditional request headers for a cached entry, if there is one."""
+        if not os.path.isfile(self._body_path(key)):
+            return {}
+        try:
+            with open(self._meta_path(key)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def hit(self, key):
+        """Return the cached body after a 304 and mark it as recently used."""
+        body_path = self._body_path(key)
+        os.utime(body_path)
+        return CachedBody(body_path, not_modified=True)
+
+    def temp_path(self, key):
+        """Return the path a new body is written to before `commit` moves it in place."""
+        return f"{self._body_path(key)}.tmp"
+
+    def store(self, key, url, response):
+        """Write a 200 response body to the cache compressed, without buffering it whole."""
+        tmp_path = self.temp_path(key)
+
+        if response.headers.get("Content-Encoding", "").lower() == "gzip":
+            # The body arrived gzip-encoded, so store the wire bytes as they are
+            with open(tmp_path, "wb") as f:
+                for chunk in response.raw.stream(64 * 1024, decode_content=False):
+                    f.write(chunk)
+        else:
+            with gzip.open(tmp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    f.write(chunk)
+        return self.commit(key, url, response.headers)
+
+    def commit(self, key, url, headers):
+        """Move a fully written body from `temp_path` into the cache with its validators."""
+        body_path = self._body_path(key)
+        os.replace(self.temp_path(key), body_path)
+
+        meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "stored_at": time.time(),
+        }
+        with open(self._meta_path(key), "w") as f:
+            json.dump(meta, f)
+
+        return CachedBody(body_path, not_modified=False)
+
+    def evict(self):
+        """Drop expired entries, then least-recently-used ones until under max_bytes."""
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json.gz"):
+                continue
+            path = os.path.join(self.directory, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, name[: -len(".json.gz")]))
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for last_used, size, key in entries:
+            if now - last_used <= self.max_age and total <= self.max_bytes:
+                break
+            for path in (self._body_path(key), self._meta_path(key)):
+                if os.path.exists(path):
+                    os.remove(path)
+            total -= size
+            evicted += 1
+
+        if evicted:
+            logger.info(f"Evicted {evicted} cached responses, {total} bytes remain")
@@ -1,9 +1,32 @@
 import os
+import csv
+import hashlib
 import pandas as pd
 import logging
 import glob
+import threading
+import time
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from sqlalchemy import func, or_, text
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
-from app.models import Earthquake
+from app.models import CURRENT_XID_SQL, Earthquake, LoadCheckpoint, LoadManifest
+from app.etl.file_formats import (
+    COLUMNS,
+    FORMAT_EXTENSIONS,
+    drop_superseded,
+    format_for_path,
+    iter_frames,
+    iter_record_batches,
+)
+from app.etl.raw_archive import partitions_in_range
+from app.etl.table_swap import (
+    build_shadow_indexes,
+    check_swappable,
+    create_shadow_table,
+    swap_tables,
+)
 from app.data.utils import get_session
 
 # Configure logging
@@ -12,71 +35,573 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Session-local table the COPY loader streams rows into before merging
+STAGING_TABLE = "earthquakes_load"
 
-def delete_old_records(session: Session, csv_file_path: str):
-    """Delete old records with the same file_name."""
-    try:
-        # Create the delete query
-        logger.info(f"Deleting old records from {csv_file_path}")
-        deleted = (
-            session.query(Earthquake)
-            .filter(Earthquake.file_name == csv_file_path)
-            .delete()
+# Unlogged copy of earthquakes that LOAD_MODE=swap rebuilds and renames in place
+SHADOW_TABLE = "earthquakes_swap"
+
+
+def prepare_records(df):
+    """Align an extract DataFrame with the earthquakes columns for loading.
+
+    Extracts written before event ids were kept get NULL event_id and updated
+    columns, and duplicate event ids keep only their latest version.
+    """
+    df = drop_superseded(df.reindex(columns=COLUMNS))
+    # Concurrent loads then lock overlapping events in the same order and
+    # wait for each other instead of deadlocking
+    df = df.sort_values("event_id", kind="stable")
+    # Keep millisecond timestamps integral when the column has gaps, and turn
+    # NaN into NULL rather than a float NaN
+    for column in ("time", "updated"):
+        df[column] = df[column].astype("Int64")
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+
+def upsert_statement(records):
+    """Build a multi-row INSERT ... ON CONFLICT upsert on event_id.
+
+    Existing rows are only rewritten when the incoming version is newer, so
+    reloading an unchanged event touches nothing. Rewritten rows get a new
+    change_xid, like inserted ones, for the incremental transform.
+    """
+    stmt = insert(Earthquake.__table__).values(records)
+    updates = {
+        column: stmt.excluded[column] for column in COLUMNS if column != "event_id"
+    }
+    updates["change_xid"] = text(CURRENT_XID_SQL)
+    return stmt.on_conflict_do_update(
+        index_elements=[Earthquake.event_id],
+        set_=updates,
+        where=or_(
+            Earthquake.updated.is_(None), stmt.excluded.updated > Earthquake.updated
+        ),
+    )
+
+
+def upsert_records(session: Session, records, batch_size=5000):
+    """Upsert prepared records in multi-row batches, returning the rows written."""
+    written = 0
+    for start in range(0, len(records), batch_size):
+        batch = records[start : start + batch_size]
+        written += session.execute(upsert_statement(batch)).rowcount
+    return written
+
+
+def file_signature(path):
+    """Identify the contents of a file by its size and modification time."""
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def save_checkpoint(session: Session, file_name: str, signature: str, rows: int):
+    """Record the rows of a file loaded so far, in the current transaction."""
+    stmt = insert(LoadCheckpoint.__table__).values(
+        file_name=file_name, signature=signature, rows_loaded=rows
+    )
+    session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[LoadCheckpoint.file_name],
+            set_={
+                "signature": stmt.excluded.signature,
+                "rows_loaded": stmt.excluded.rows_loaded,
+                "updated_at": func.now(),
+            },
         )
+    )
+
+
+def load_csv_to_postgres(
+    session: Session, csv_file_path: str, batch_size=5000, chunk_size=50_000
+):
+    """Upsert an extracted CSV, Parquet or Arrow file into PostgreSQL by event_id.
+
+    The file is read and committed `chunk_size` rows at a time, so memory
+    stays bounded by the chunk size. Each commit also records a checkpoint;
+    after a failure, loading the same unchanged file again resumes after
+    the last committed chunk.
+    """
+    logger.info(f"Loading data from {csv_file_path}")
+    started = time.perf_counter()
+    file_name = os.path.abspath(csv_file_path)
+    signature = file_signature(csv_file_path)
+
+    checkpoint = session.get(LoadCheckpoint, file_name)
+    resume_from = 0
+    if checkpoint is not None and checkpoint.signature == signature:
+        resume_from = checkpoint.rows_loaded
+        logger.info(f"Resuming {csv_file_path} after {resume_from} loaded rows")
+
+    offset = 0
+    written = 0
+    try:
+        for chunk in iter_frames(csv_file_path, chunk_size):
+            chunk_start, offset = offset, offset + len(chunk)
+            if offset <= resume_from:
+                continue
+            if chunk_start < resume_from:
+                chunk = chunk.iloc[resume_from - chunk_start :]
+
+            written += upsert_records(session, prepare_records(chunk), batch_size)
+            save_checkpoint(session, file_name, signature, offset)
+            session.commit()
+            logger.info(f"Committed rows up to {offset} of {csv_file_path}")
+
+        session.query(LoadCheckpoint).filter(
+            LoadCheckpoint.file_name == file_name
+        ).delete()
         session.commit()
-        logger.info(f"Deleted {deleted} old records")
     except Exception as e:
         session.rollback()
-        logger.error(f"Error deleting old records: {e}")
+        logger.error(f"Error loading data to PostgreSQL: {e}")
         raise
 
+    loaded = offset - min(resume_from, offset)
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"Upserted {loaded} records from {csv_file_path} in {elapsed:.1f}s "
+        f"({loaded / max(elapsed, 1e-9):.0f} rows/s), {written} inserted or changed"
+    )
+
+
+class _RecordBatchCSVReader:
+    """File-like object serving Arrow record batches as headerless CSV for COPY."""
+
+    def __init__(self, batches):
+        self._batches = iter(batches)
+        self._chunk = b""
+        self._offset = 0
+
+    def read(self, size=-1):
+        import pyarrow as pa
+        import pyarrow.csv as pv
+
+        while self._offset >= len(self._chunk):
+            batch = next(self._batches, None)
+            if batch is None:
+                return b""
+            sink = pa.BufferOutputStream()
+            pv.write_csv(
+                batch, sink, write_options=pv.WriteOptions(include_header=False)
+            )
+            self._chunk = sink.getvalue().to_pybytes()
+            self._offset = 0
+
+        end = len(self._chunk) if size < 0 else self._offset + size
+        data = self._chunk[self._offset : end]
+        self._offset = end
+        return data
+
+
+def create_staging_table(cur):
+    """Create the transaction-scoped staging table with the earthquakes column types."""
+    cur.execute(f"""
+        CREATE TEMP TABLE {STAGING_TABLE} ON COMMIT DROP AS
+        SELECT {", ".join(COLUMNS)} FROM earthquakes WITH NO DATA
+        """)
+
+
+def copy_file_to_staging(cur, path):
+    """Stream an extract file into the staging table with COPY, returning its row count.
+
+    CSV extracts are sent as they are; Parquet and Arrow files are converted
+    to CSV one record batch at a time, so memory stays bounded either way.
+    """
+    if format_for_path(path) == "csv":
+        with open(path, newline="") as f:
+            # Extracts written before a column existed simply leave it NULL
+            columns = next(csv.reader([f.readline()]))
+            unknown = set(columns) - set(COLUMNS)
+            if unknown:
+                raise ValueError(f"Unexpected columns in {path}: {sorted(unknown)}")
+            cur.copy_expert(
+                f"COPY {STAGING_TABLE} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                f,
+                size=1 << 20,
+            )
+    else:
+        cur.copy_expert(
+            f"COPY {STAGING_TABLE} ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            _RecordBatchCSVReader(iter_record_batches(path)),
+            size=1 << 20,
+        )
+    return cur.rowcount
+
+
+def insert_legacy_rows(cur, table):
+    """Insert the staged rows without an event_id into `table`, returning the rows added.
 
-def load_csv_to_postgres(session: Session, csv_file_path: str):
-    """Load CSV data to PostgreSQL using SQLAlchemy."""
+    Extracts written before event ids were kept cannot be upserted, so their
+    rows are matched against earthquakes on time, position and magnitude
+    instead, and reloading such a file adds nothing. Rows that have no time
+    either cannot be matched and are skipped.
+    """
+    matched = " AND ".join(
+        ["e.time = s.time"]
+        + [
+            f"e.{column} IS NOT DISTINCT FROM s.{column}"
+            for column in ("latitude", "longitude", "magnitude")
+        ]
+    )
+    columns = ", ".join(COLUMNS)
+    cur.execute(f"""
+        INSERT INTO {table} ({columns})
+        SELECT DISTINCT {columns}
+        FROM {STAGING_TABLE} s
+        WHERE s.event_id IS NULL AND s.time IS NOT NULL
+        AND NOT EXISTS (SELECT 1 FROM earthquakes e WHERE {matched})
+        """)
+    inserted = cur.rowcount
+
+    cur.execute(
+        f"SELECT COUNT(*) FROM {STAGING_TABLE} WHERE event_id IS NULL AND time IS NULL"
+    )
+    skipped = cur.fetchone()[0]
+    if skipped:
+        logger.warning(f"Skipped {skipped} staged rows without an event_id or time")
+    return inserted
+
+
+def merge_staging(cur):
+    """Merge the staging table into earthquakes, returning the rows written.
+
+    Events keep their latest version and existing rows are only rewritten
+    when the staged version is newer, as with `upsert_statement`. Rows
+    without an event_id are added by `insert_legacy_rows`.
+    """
+    columns = ", ".join(COLUMNS)
+    updates = ", ".join(
+        [f"{column} = EXCLUDED.{column}" for column in COLUMNS if column != "event_id"]
+        + [f"change_xid = {CURRENT_XID_SQL}"]
+    )
+    cur.execute(f"""
+        INSERT INTO earthquakes ({columns})
+        SELECT DISTINCT ON (event_id) {columns}
+        FROM {STAGING_TABLE}
+        WHERE event_id IS NOT NULL
+        ORDER BY event_id, updated DESC NULLS LAST
+        ON CONFLICT (event_id) DO UPDATE SET {updates}
+        WHERE earthquakes.updated IS NULL OR EXCLUDED.updated > earthquakes.updated
+        """)
+    return cur.rowcount + insert_legacy_rows(cur, "earthquakes")
+
+
+def copy_files_to_postgres(session: Session, paths, source: str):
+    """Bulk load extract files with COPY into a staging table, then merge them.
+
+    The COPY and the merge run in the session's transaction, so earthquakes
+    either receives every file or none of them.
+    """
+    started = time.perf_counter()
     try:
-        logger.info(f"Loading data from {csv_file_path}")
+        cur = session.connection().connection.cursor()
+        try:
+            create_staging_table(cur)
+            copied = 0
+            for path in paths:
+                copied += copy_file_to_staging(cur, path)
+            copy_seconds = time.perf_counter() - started
+            written = merge_staging(cur)
+        finally:
+            cur.close()
+
+        session.commit()
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"Loaded {copied} records from {source} in {elapsed:.1f}s "
+            f"({copied / max(elapsed, 1e-9):.0f} rows/s; COPY {copy_seconds:.1f}s), "
+            f"{written} inserted or changed"
+        )
+        return written
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Error copying data to PostgreSQL: {e}")
+        raise
+
+
+def fill_shadow_table(cur):
+    """Fill the shadow table with earthquakes merged with the staged rows.
+
+    Staged versions replace existing rows under the same rules as
+    `merge_staging`, and replaced rows keep their id. Only replaced and new
+    rows get a new change_xid. Rows without an event_id are added by
+    `insert_legacy_rows`.
+    """
+    newer = (
+        "s.event_id IS NOT NULL AND "
+        "(e.id IS NULL OR e.updated IS NULL OR s.updated > e.updated)"
+    )
+    merged = ", ".join(
+        f"CASE WHEN {newer} THEN s.{column} ELSE e.{column} END" for column in COLUMNS
+    )
+    columns = ", ".join(COLUMNS)
+    cur.execute(f"""
+        INSERT INTO {SHADOW_TABLE} (id, change_xid, {columns})
+        SELECT COALESCE(e.id, nextval(pg_get_serial_sequence('earthquakes', 'id'))),
+               CASE WHEN {newer} THEN {CURRENT_XID_SQL} ELSE e.change_xid END,
+               {merged}
+        FROM earthquakes e
+        FULL JOIN (
+            SELECT DISTINCT ON (event_id) {columns}
+            FROM {STAGING_TABLE}
+            WHERE event_id IS NOT NULL
+            ORDER BY event_id, updated DESC NULLS LAST
+        ) s ON s.event_id = e.event_id
+        """)
+    return cur.rowcount + insert_legacy_rows(cur, SHADOW_TABLE)
 
-        # Read the CSV file
-        df = pd.read_csv(csv_file_path)
 
-        # Convert the DataFrame to a list of dictionaries
-        earthquake_data = df.to_dict(orient="records")
+def swap_files_to_postgres(session: Session, paths, source: str):
+    """Rebuild earthquakes with the extract files merged in, then swap it in place.
 
-        # Create Earthquake objects and add them to the session
-        for record in earthquake_data:
-            earthquake = Earthquake(**record)
-            session.add(earthquake)
+    Files are COPYed into the staging table and merged with the current rows
+    into an unlogged shadow table, whose indexes are built after it is
+    filled. Writers are held off meanwhile, but readers keep querying the
+    old table until the rename, and then see the new one in full.
+
+    Every load rewrites, and WAL-logs, the whole table however small the
+    files are, so this is meant for bulk reloads rather than regular runs.
+    """
+    started = time.perf_counter()
+    try:
+        cur = session.connection().connection.cursor()
+        try:
+            # Block other writers, whose changes the swap would drop, but not readers
+            cur.execute("LOCK TABLE earthquakes IN EXCLUSIVE MODE")
+            check_swappable(cur, "earthquakes")
+            create_staging_table(cur)
+            copied = 0
+            for path in paths:
+                copied += copy_file_to_staging(cur, path)
+
+            create_shadow_table(cur, "earthquakes", SHADOW_TABLE)
+            total = fill_shadow_table(cur)
+            build_shadow_indexes(cur, "earthquakes", SHADOW_TABLE)
+            swap_tables(cur, "earthquakes", SHADOW_TABLE)
+        finally:
+            cur.close()
 
-        # Commit the transaction
         session.commit()
-        logger.info(f"Successfully loaded {len(earthquake_data)} records to database")
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"Loaded {copied} records from {source} by swapping in a rebuilt table "
+            f"of {total} rows in {elapsed:.1f}s ({copied / max(elapsed, 1e-9):.0f} rows/s)"
+        )
+        return total
     except Exception as e:
         session.rollback()
-        logger.error(f"Error loading data to PostgreSQL: {e}")
+        logger.error(f"Error swapping data into PostgreSQL: {e}")
         raise
 
 
-def find_latest_csv():
-    """Find the latest earthquake data CSV file."""
+def load_files_to_postgres(
+    session: Session, paths, source: str, mode="copy", chunk_size=50_000
+):
+    """Load extract files with the given LOAD_MODE."""
+    if mode == "copy":
+        return copy_files_to_postgres(session, paths, source)
+    if mode == "swap":
+        return swap_files_to_postgres(session, paths, source)
+    for path in paths:
+        load_csv_to_postgres(session, path, chunk_size=chunk_size)
+
+
+def load_archive_to_postgres(
+    session: Session, start_date: str, end_date: str, mode="copy", chunk_size=50_000
+):
+    """Upsert archived events for a date range, reading only its partitions."""
+    load_files_to_postgres(
+        session,
+        partitions_in_range(start_date, end_date),
+        f"archive {start_date} to {end_date}",
+        mode,
+        chunk_size,
+    )
+
+
+def archive_date_range(start_date: str, end_date: str):
+    """Validate the LOAD_START_DATE and LOAD_END_DATE of an archive load.
+
+    An empty end date defaults to the start date. Raises ValueError for a
+    missing or malformed date, or a range that ends before it starts.
+    """
+    if not start_date.strip():
+        raise ValueError("LOAD_SOURCE=archive requires LOAD_START_DATE (YYYY-MM-DD)")
+    end_date = end_date.strip() or start_date
+    try:
+        first = date.fromisoformat(start_date.strip())
+        last = date.fromisoformat(end_date.strip())
+    except ValueError:
+        raise ValueError(
+            f"LOAD_START_DATE and LOAD_END_DATE must be YYYY-MM-DD dates, "
+            f"got {start_date!r} and {end_date!r}"
+        ) from None
+    if last < first:
+        raise ValueError(f"LOAD_END_DATE {last} is before LOAD_START_DATE {first}")
+    return first.isoformat(), last.isoformat()
+
+
+def find_extract_files():
+    """Find every earthquake data file in a supported extract format, oldest first."""
     data_dir = os.path.join(
         os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"
     )
-    csv_pattern = os.path.join(data_dir, "earthquake_data_*.csv")
-    csv_files = glob.glob(csv_pattern)
+    csv_files = []
+    for extension in FORMAT_EXTENSIONS.values():
+        csv_pattern = os.path.join(data_dir, f"earthquake_data_*{extension}")
+        csv_files.extend(glob.glob(csv_pattern))
+    return sorted(csv_files, key=os.path.getmtime)
+
 
+def find_latest_csv():
+    """Find the latest earthquake data file in any supported extract format."""
+    csv_files = find_extract_files()
     if not csv_files:
-        logger.error("No earthquake data CSV files found")
+        logger.error("No earthquake data files found")
         return None
 
-    # Sort by modification time (newest first)
-    latest_csv = max(csv_files, key=os.path.getmtime)
-    logger.info(f"Found latest CSV file: {latest_csv}")
+    # Sorted by modification time, oldest first
+    latest_csv = csv_files[-1]
+    logger.info(f"Found latest extract file: {latest_csv}")
     return latest_csv
 
 
+def file_checksum(path):
+    """Return the SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def record_loaded(session: Session, path: str, checksum: str):
+    """Add a loaded file to the load_manifest table."""
+    stmt = insert(LoadManifest.__table__).values(
+        checksum=checksum,
+        file_name=os.path.basename(path),
+        file_size=os.path.getsize(path),
+    )
+    session.execute(stmt.on_conflict_do_nothing(index_elements=["checksum"]))
+    session.commit()
+
+
+def find_pending_files(session: Session, paths):
+    """Return (path, checksum) for files whose contents are not in load_manifest yet.
+
+    Files with identical contents are only returned once.
+    """
+    checksums = {}
+    for path in paths:
+        checksums.setdefault(file_checksum(path), path)
+
+    loaded = {
+        checksum
+        for (checksum,) in session.query(LoadManifest.checksum).filter(
+            LoadManifest.checksum.in_(list(checksums))
+        )
+    }
+    session.commit()
+    return [
+        (path, checksum)
+        for checksum, path in checksums.items()
+        if checksum not in loaded
+    ]
+
+
+def load_pending_to_postgres(mode="copy", chunk_size=50_000, workers=4):
+    """Load every extract file not yet in load_manifest, several at a time.
+
+    Files are spread over a pool of `workers` threads, each with its own
+    database session. A failed file does not stop the others; it is left
+    out of the manifest so the next run retries it. The swap mode, which
+    rewrites the whole table, is for bulk reloads only and is rejected here.
+    """
+    if mode == "swap":
+        raise ValueError(
+            "LOAD_MODE=swap rewrites the whole table on every load; use it for "
+            "bulk reloads of the latest extract or the archive, not LOAD_SOURCE=pending"
+        )
+
+    session = get_session()
+    try:
+        pending = find_pending_files(session, find_extract_files())
+        logger.info(f"Found {len(pending)} pending extract files")
+        if not pending:
+            return 0
+    finally:
+        session.close()
+
+    local = threading.local()
+    sessions = []
+    sessions_lock = threading.Lock()
+
+    def load_one(path, checksum):
+        if not hasattr(local, "session"):
+            local.session = get_session()
+            with sessions_lock:
+                sessions.append(local.session)
+        load_files_to_postgres(local.session, [path], path, mode, chunk_size)
+        record_loaded(local.session, path, checksum)
+
+    failed = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(load_one, path, checksum): path
+                for path, checksum in pending
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    failed.append(futures[future])
+                    logger.error(f"Failed to load {futures[future]}: {e}")
+    finally:
+        for worker_session in sessions:
+            worker_session.close()
+
+    if failed:
+        raise RuntimeError(f"Failed to load {len(failed)} of {len(pending)} files")
+    return len(pending)
+
+
 def main():
     """Main function to load earthquake data to PostgreSQL."""
     try:
+        # "copy" bulk loads through COPY and a staging table, "swap" rebuilds
+        # the table from it and renames it in place, "orm" upserts batches of
+        # rows through SQLAlchemy
+        load_mode = os.getenv("LOAD_MODE", "copy").lower()
+        if load_mode not in ("copy", "swap", "orm"):
+            raise ValueError(f"Unsupported LOAD_MODE: {load_mode}")
+        # Rows read and committed at a time by the "orm" mode
+        chunk_size = int(os.getenv("LOAD_CHUNK_SIZE", "50000"))
+
+        # "latest" loads the newest extract file, "pending" every extract not
+        # loaded yet, "archive" backfills a date range from the raw archive
+        load_source = os.getenv("LOAD_SOURCE", "latest").lower()
+        if load_source == "pending":
+            workers = int(os.getenv("LOAD_WORKERS", "4"))
+            loaded = load_pending_to_postgres(load_mode, chunk_size, workers)
+            logger.info(f"ETL process completed successfully, loaded {loaded} files")
+            return
+
+        if load_source == "archive":
+            start_date, end_date = archive_date_range(
+                os.getenv("LOAD_START_DATE", ""), os.getenv("LOAD_END_DATE", "")
+            )
+            session = get_session()
+            try:
+                load_archive_to_postgres(
+                    session, start_date, end_date, load_mode, chunk_size
+                )
+                logger.info("ETL process completed successfully")
+            finally:
+                session.close()
+            return
+
         # Find the latest CSV file
         csv_file_path = find_latest_csv()
         if not csv_file_path:
@@ -86,17 +611,19 @@ def main():
         session = get_session()
 
         try:
-            # Delete old records with the same file_name
-            delete_old_records(session, csv_file_path)
-
-            # Load data from CSV to PostgreSQL
-            load_csv_to_postgres(session, csv_file_path)
+            # Upsert by event_id; overlapping extract windows update rows in
+            # place instead of deleting and reinserting them
+            load_files_to_postgres(
+                session, [csv_file_path], csv_file_path, load_mode, chunk_size
+            )
+            record_loaded(session, csv_file_path, file_checksum(csv_file_path))
 
             logger.info("ETL process completed successfully")
         finally:
             session.close()
     except Exception as e:
         logger.error(f"An error occurred in the ETL process: {e}")
+        raise
 
 
 if __name__ == "__main__":
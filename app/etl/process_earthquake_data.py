@@ -1,8 +1,22 @@
 import requests
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import csv
+import glob
+import json
 import os
+import tempfile
 import logging
+from app.etl.file_formats import (
+    COLUMNS,
+    FORMAT_EXTENSIONS,
+    combine_csv_parts,
+    write_frame,
+)
+from app.etl.geojson_stream import iter_features
+from app.etl.http_cache import ResponseCache
+from app.etl.raw_archive import archive_extract
+from app.etl import async_fetch, usgs_fetch
 
 # Configure logging
 logging.basicConfig(
@@ -11,32 +25,216 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def process_earthquake_data():
+def feature_to_row(feature, filename):
+    """Flatten a GeoJSON feature into a row for the extracted file."""
+    properties = feature.get("properties", {})
+    geometry = feature.get("geometry", {})
+    coordinates = geometry.get("coordinates", [0, 0, 0])
+
+    return {
+        "event_id": feature.get("id"),
+        "time": properties.get("time"),
+        "updated": properties.get("updated"),
+        "place": properties.get("place"),
+        "magnitude": properties.get("mag"),
+        "longitude": coordinates[0] if len(coordinates) > 0 else 0,
+        "latitude": coordinates[1] if len(coordinates) > 1 else 0,
+        "depth": coordinates[2] if len(coordinates) > 2 else 0,
+        "file_name": filename,
+    }
+
+
+def max_updated(features):
+    """Return the newest `updated` timestamp (ms) among the features, if any."""
+    return max(
+        (
+            feature["properties"]["updated"]
+            for feature in features
+            if feature.get("properties", {}).get("updated") is not None
+        ),
+        default=None,
+    )
+
+
+def load_watermark(watermark_path, filename):
+    """Return the `updated` high-water mark (ms) to query from, or None for a full window.
+
+    A rerun that rewrites the same output file reuses the mark the first run
+    started from, so the rewritten file keeps every event that run fetched.
+    """
+    if not os.path.isfile(watermark_path):
+        logger.info("No extraction watermark found, fetching the full window")
+        return None
+
     try:
-        # Calculate date range
-        today_date = datetime.now()
-        fifteen_days_ago = today_date - timedelta(days=15)
-        start_time = fifteen_days_ago.strftime("%Y-%m-%d")
-        end_time = today_date.strftime("%Y-%m-%d")
+        with open(watermark_path) as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable watermark {watermark_path}: {e}")
+        return None
+
+    if state.get("file_name") == filename:
+        return state.get("previous")
+    return state.get("updated")
+
+
+def save_watermark(watermark_path, filename, base, fetched_max, window_end):
+    """Persist the new high-water mark after the output file is fully written.
+
+    The mark never passes `window_end` (ms): an event after the window can
+    have been updated before the newest fetched event, and the next window
+    has to fetch it all the same.
+    """
+    newest = max(
+        (value for value in (base, fetched_max) if value is not None),
+        default=None,
+    )
+    state = {
+        "updated": None if newest is None else min(newest, window_end),
+        "previous": base,
+        "file_name": filename,
+    }
+    tmp_path = f"{watermark_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, watermark_path)
+    logger.info(f"Extraction watermark set to {state['updated']}")
+
+
+def stream_features_to_csv(response, part_path, filename, batch_size):
+    """Parse a response body incrementally and write its rows to `part_path` in batches.
+
+    Returns the part path, its row count and the newest `updated` timestamp.
+    """
+    row_count = 0
+    newest = None
+    with open(part_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        batch = []
+        for feature in iter_features(response.iter_content(chunk_size=64 * 1024)):
+            batch.append(feature_to_row(feature, filename))
+            updated = feature.get("properties", {}).get("updated")
+            if updated is not None and (newest is None or updated > newest):
+                newest = updated
+            if len(batch) >= batch_size:
+                writer.writerows(batch)
+                row_count += len(batch)
+                batch.clear()
+        writer.writerows(batch)
+        row_count += len(batch)
+    return part_path, row_count, newest
+
+
+def extract_streaming(fetch_windows, filename, fmt):
+    """Stream each window into its own part file, then combine them in time order.
+
+    `fetch_windows(handler)` applies the handler to every window in time order.
+
+    Returns the row count and the newest `updated` timestamp written.
+    """
+    folder_path = os.path.dirname(filename)
+    batch_size = int(os.getenv("EXTRACT_BATCH_SIZE", "5000"))
+
+    # Every part created, so that a failed window or fetch removes them all
+    part_paths = []
+
+    def handle_window(response):
+        fd, part_path = tempfile.mkstemp(dir=folder_path, suffix=".part")
+        os.close(fd)
+        part_paths.append(part_path)
+        return stream_features_to_csv(response, part_path, filename, batch_size)
+
+    try:
+        parts = fetch_windows(handle_window)
+
+        # Assemble the output next to the target so the final rename is atomic
+        tmp_filename = f"{filename}.tmp"
+        combine_csv_parts([part[0] for part in parts], tmp_filename, fmt)
+        os.replace(tmp_filename, filename)
+    finally:
+        for part_path in part_paths:
+            if os.path.exists(part_path):
+                os.remove(part_path)
 
-        # Define API URL
-        url = f"https://earthquake.usgs.gov/fdsnws/event/1/query?format=geojson&starttime={start_time}&endtime={end_time}"
+    row_count = sum(part[1] for part in parts)
+    newest = max((part[2] for part in parts if part[2] is not None), default=None)
+    return row_count, newest
 
-        logger.info(f"Fetching earthquake data from {start_time} to {end_time}")
 
-        # Make API request
-        response = requests.get(url)
-        response.raise_for_status()  # Raise exception for HTTP errors
+def extract_in_memory(fetch_windows, filename, fmt):
+    """Fetch every window into memory, then write the whole DataFrame at once.
 
-        data = response.json()
-        logger.info(f"Received response with status code: {response.status_code}")
+    Returns the row count and the newest `updated` timestamp written.
+    """
+    feature_batches = fetch_windows(
+        lambda response: response.json().get("features", [])
+    )
 
-        # Process earthquake data
-        earthquakes = []
-        features = data.get("features", [])
-        logger.info(f"Processing {len(features)} earthquake features")
+    # Process earthquake data
+    features = [feature for batch in feature_batches for feature in batch]
+    logger.info(f"Processing {len(features)} earthquake features")
 
-        # Get the directory for saving the CSV
+    # Extract data from features
+    earthquakes = [feature_to_row(feature, filename) for feature in features]
+
+    # Create DataFrame and save it in the requested format
+    df = pd.DataFrame(earthquakes, columns=COLUMNS)
+    write_frame(df, filename, fmt)
+    return len(df), max_updated(features)
+
+
+def rotate_extracts(folder_path, current, archive_dir):
+    """Remove every extract in `folder_path` but `current` once it is in the archive.
+
+    Each one is merged into the archive before it is removed, which changes
+    nothing for an extract archived when it was written, since the archive
+    keeps the latest version of every event. Disk use then grows with the
+    archive's unique events instead of with runs times the extract window.
+    """
+    for extension in FORMAT_EXTENSIONS.values():
+        pattern = os.path.join(folder_path, f"earthquake_data_*{extension}")
+        for path in sorted(glob.glob(pattern)):
+            if path != current:
+                archive_extract(path, archive_dir)
+                os.remove(path)
+                logger.info(f"Removed archived extract {path}")
+
+
+def process_earthquake_data():
+    try:
+        # Calculate date range
+        # Naive UTC times, which USGS reads as UTC
+        today_date = datetime.now(timezone.utc).replace(tzinfo=None)
+        end_time = today_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        start_time = end_time - timedelta(days=15)
+
+        # "memory" parses each response whole, "stream" keeps memory flat
+        extract_mode = os.getenv("EXTRACT_MODE", "memory").lower()
+
+        # File format of the extract: csv, parquet or arrow-ipc
+        output_format = os.getenv("EXTRACT_FORMAT", "csv").lower()
+        if output_format not in FORMAT_EXTENSIONS:
+            raise ValueError(f"Unknown EXTRACT_FORMAT: {output_format}")
+
+        # Sub-window size and concurrency for the fetch engine; "threads" uses a
+        # bounded thread pool, "async" a rate-limited asyncio client
+        fetch_client = os.getenv("FETCH_CLIENT", "threads").lower()
+        fetch_kwargs = {
+            "window": timedelta(hours=int(os.getenv("FETCH_WINDOW_HOURS", "24"))),
+        }
+        if fetch_client == "async":
+            fetch_time_range = async_fetch.fetch_time_range
+            fetch_kwargs["max_connections"] = int(os.getenv("FETCH_WORKERS", "4"))
+            fetch_kwargs["rate"] = float(os.getenv("FETCH_RATE_LIMIT", "5"))
+            fetch_kwargs["retries"] = int(os.getenv("FETCH_RETRIES", "4"))
+            fetch_kwargs["timeout"] = int(os.getenv("FETCH_TIMEOUT", "60"))
+        elif fetch_client == "threads":
+            fetch_time_range = usgs_fetch.fetch_time_range
+            fetch_kwargs["max_workers"] = int(os.getenv("FETCH_WORKERS", "4"))
+        else:
+            raise ValueError(f"Unknown FETCH_CLIENT: {fetch_client}")
+
+        # Get the directory for saving the extract
         # In Docker, this will be /app/data
         folder_path = os.path.join(
             os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"
@@ -46,35 +244,85 @@ def process_earthquake_data():
         os.makedirs(folder_path, exist_ok=True)
 
         date = today_date.strftime("%Y_%m_%d")
-        filename = os.path.join(folder_path, f"earthquake_data_{date}.csv")
+        extension = FORMAT_EXTENSIONS[output_format]
+        filename = os.path.join(folder_path, f"earthquake_data_{date}{extension}")
+
+        # Only ask for events updated since the last run when a watermark exists
+        incremental = os.getenv("EXTRACT_INCREMENTAL", "true").lower() == "true"
+        watermark_path = os.path.join(folder_path, "extract_watermark.json")
+        watermark = load_watermark(watermark_path, filename) if incremental else None
+        if watermark is not None:
+            updated_after = datetime.fromtimestamp(watermark / 1000, tz=timezone.utc)
+            fetch_kwargs["params"] = {
+                "updatedafter": updated_after.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3]
+            }
+            logger.info(f"Fetching only events updated after {updated_after}")
 
         # Check if file already exists
         file_exists = os.path.isfile(filename)
+
+        logger.info(
+            f"Fetching earthquake data from {start_time:%Y-%m-%d} to "
+            f"{end_time:%Y-%m-%d} in {extract_mode} mode"
+        )
+
+        cache = None
+        if os.getenv("HTTP_CACHE", "true").lower() == "true":
+            # Download every window into the response cache first, so a rerun
+            # that gets 304s everywhere can skip parsing and rewriting the file
+            cache = ResponseCache(
+                os.path.join(folder_path, "http_cache"),
+                max_bytes=int(os.getenv("HTTP_CACHE_MAX_MB", "512")) * 1024 * 1024,
+                max_age=int(os.getenv("HTTP_CACHE_MAX_AGE_DAYS", "7")) * 86400,
+            )
+            bodies = fetch_time_range(
+                start_time, end_time, lambda body: body, cache=cache, **fetch_kwargs
+            )
+
+            if file_exists and all(body.not_modified for body in bodies):
+                logger.info(f"No window changed since {filename} was written")
+                cache.evict()
+                return filename
+
+            def fetch_windows(handler):
+                return [handler(body) for body in bodies]
+
+        else:
+
+            def fetch_windows(handler):
+                return fetch_time_range(start_time, end_time, handler, **fetch_kwargs)
+
         if file_exists:
             logger.info(f"File {filename} already exists and will be overwritten.")
 
-        # Extract data from features
-        for feature in features:
-            properties = feature.get("properties", {})
-            geometry = feature.get("geometry", {})
-            coordinates = geometry.get("coordinates", [0, 0, 0])
-
-            earthquake = {
-                "time": properties.get("time"),
-                "place": properties.get("place"),
-                "magnitude": properties.get("mag"),
-                "longitude": coordinates[0] if len(coordinates) > 0 else 0,
-                "latitude": coordinates[1] if len(coordinates) > 1 else 0,
-                "depth": coordinates[2] if len(coordinates) > 2 else 0,
-                "file_name": filename,
-            }
-            earthquakes.append(earthquake)
+        try:
+            if extract_mode == "stream":
+                row_count, newest = extract_streaming(
+                    fetch_windows, filename, output_format
+                )
+            elif extract_mode == "memory":
+                row_count, newest = extract_in_memory(
+                    fetch_windows, filename, output_format
+                )
+            else:
+                raise ValueError(f"Unknown EXTRACT_MODE: {extract_mode}")
+        finally:
+            # Only evict once the cached bodies of this run have been parsed
+            if cache is not None:
+                cache.evict()
+
+        logger.info(f"Saved {row_count} records to {filename}")
 
-        # Create DataFrame and save to CSV
-        df = pd.DataFrame(earthquakes)
-        df.to_csv(filename, index=False)
+        # Fold the extract into the date-partitioned raw archive, keeping only
+        # this run's extract for the load task
+        if os.getenv("RAW_ARCHIVE", "true").lower() == "true":
+            archive_dir = os.path.join(folder_path, "raw")
+            archive_extract(filename, archive_dir)
+            rotate_extracts(folder_path, filename, archive_dir)
 
-        logger.info(f"Data saved to {filename}")
+        if incremental:
+            window_end = end_time.replace(tzinfo=timezone.utc).timestamp() * 1000
+            save_watermark(watermark_path, filename, watermark, newest, int(window_end))
         return filename
 
     except requests.exceptions.RequestException as e:
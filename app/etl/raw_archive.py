@@ -0,0 +1,177 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+import pandas as pd
+
+from app.etl.file_formats import (
+    COLUMNS,
+    arrow_schema,
+    drop_superseded,
+    iter_record_batches,
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "_manifest.json"
+
+MS_PER_DAY = 86_400_000
+
+
+def default_archive_dir():
+    """Return the archive root under the data directory, data/raw."""
+    return os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "raw"
+    )
+
+
+def load_manifest(archive_dir):
+    """Return the manifest mapping each partition date to its file and row count."""
+    manifest_path = os.path.join(archive_dir, MANIFEST_NAME)
+    if not os.path.isfile(manifest_path):
+        return {}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def save_manifest(archive_dir, manifest):
+    """Atomically replace the manifest."""
+    manifest_path = os.path.join(archive_dir, MANIFEST_NAME)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def _partition_key(day_number):
+    return (date(1970, 1, 1) + timedelta(days=day_number)).isoformat()
+
+
+def _split_by_day(extract_path, staging_dir):
+    """Spread the rows of an extract into one staging Parquet file per UTC event date."""
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema()
+    writers = {}
+    skipped = 0
+    try:
+        for batch in iter_record_batches(extract_path):
+            skipped += batch["time"].null_count
+            days = pc.divide(batch["time"], MS_PER_DAY)
+            for day_number in pc.unique(days.drop_null()).to_pylist():
+                key = _partition_key(day_number)
+                if key not in writers:
+                    writers[key] = pq.ParquetWriter(
+                        os.path.join(staging_dir, f"{key}.parquet"), schema
+                    )
+                writers[key].write_batch(batch.filter(pc.equal(days, day_number)))
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    if skipped:
+        logger.warning(f"Skipped {skipped} rows without an event time")
+    return sorted(writers)
+
+
+def archive_extract(extract_path, archive_dir=None):
+    """Merge an extract into the archive, one partition per UTC event date.
+
+    Each touched partition is rewritten as a single zstd-compressed Parquet
+    file holding the latest version of every event, so the archive grows with
+    unique events rather than with runs times the extract window.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    archive_dir = archive_dir or default_archive_dir()
+    os.makedirs(archive_dir, exist_ok=True)
+    manifest = load_manifest(archive_dir)
+    schema = arrow_schema()
+    replaced = []
+
+    staging_dir = tempfile.mkdtemp(dir=archive_dir, prefix="_staging-")
+    try:
+        days = _split_by_day(extract_path, staging_dir)
+        for key in days:
+            frames = [
+                pq.ParquetFile(os.path.join(staging_dir, f"{key}.parquet")).read()
+            ]
+            entry = manifest.get(key)
+            if entry:
+                # Read the file directly; read_table would also add the dt=
+                # directory name as a hive partition column
+                old_path = os.path.join(archive_dir, entry["file"])
+                frames.insert(0, pq.ParquetFile(old_path).read())
+                replaced.append(entry["file"])
+
+            df = drop_superseded(pa.concat_tables(frames).to_pandas())
+            df = df.sort_values("time", kind="stable")
+
+            relative_path = os.path.join(
+                f"dt={key}", f"part-{uuid.uuid4().hex[:12]}.parquet"
+            )
+            os.makedirs(os.path.join(archive_dir, f"dt={key}"), exist_ok=True)
+            pq.write_table(
+                pa.Table.from_pandas(df[COLUMNS], schema=schema, preserve_index=False),
+                os.path.join(archive_dir, relative_path),
+                compression="zstd",
+            )
+            manifest[key] = {
+                "file": relative_path,
+                "rows": len(df),
+                "max_updated": (
+                    int(df["updated"].max()) if df["updated"].notna().any() else None
+                ),
+                "written_at": datetime.now(timezone.utc).isoformat(),
+            }
+
+        # Publish the new partition files before removing the ones they replace
+        save_manifest(archive_dir, manifest)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    for relative_path in replaced:
+        old_path = os.path.join(archive_dir, relative_path)
+        if os.path.exists(old_path):
+            os.remove(old_path)
+
+    logger.info(f"Archived {extract_path} into {len(days)} daily partitions")
+    return days
+
+
+def partitions_in_range(start_date, end_date, archive_dir=None):
+    """Return the archive files for event dates in [start_date, end_date], from the manifest."""
+    archive_dir = archive_dir or default_archive_dir()
+    manifest = load_manifest(archive_dir)
+    start_key, end_key = str(start_date), str(end_date)
+    return [
+        os.path.join(archive_dir, manifest[key]["file"])
+        for key in sorted(manifest)
+        if start_key <= key <= end_key
+    ]
+
+
+def read_range(start_date, end_date, archive_dir=None):
+    """Read the archived events for [start_date, end_date], touching only those partitions."""
+    paths = partitions_in_range(start_date, end_date, archive_dir)
+    logger.info(
+        f"Reading {len(paths)} archive partitions from {start_date} to {end_date}"
+    )
+    if not paths:
+        return pd.DataFrame(columns=COLUMNS)
+
+    import pyarrow.parquet as pq
+
+    return pd.concat(
+        [pq.ParquetFile(path).read().to_pandas() for path in paths], ignore_index=True
+    )
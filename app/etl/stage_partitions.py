@@ -0,0 +1,186 @@
+import logging
+import os
+import re
+from datetime import date
+
+from psycopg2 import sql
+
+from app.data.utils import get_connection
+from app.etl.stage_rollups import ROLLUP_TABLES
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "stage_earthquakes"
+DEFAULT_PARTITION = "stage_earthquakes_default"
+
+_PARTITION_NAME = re.compile(r"^stage_earthquakes_y(\d{4})m(\d{2})$")
+
+
+def add_months(month, months):
+    """Return the first day of the month `months` after the month of `month`."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    """Return the name of the partition holding the rows of `month`."""
+    return f"{PARENT_TABLE}_y{month:%Y}m{month:%m}"
+
+
+def month_partitions(cur):
+    """Return {first day of month: partition name} for the attached monthly partitions."""
+    cur.execute(
+        """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+        """,
+        (PARENT_TABLE,),
+    )
+    partitions = {}
+    for (name,) in cur.fetchall():
+        match = _PARTITION_NAME.match(name)
+        if match:
+            partitions[date(int(match[1]), int(match[2]), 1)] = name
+    return partitions
+
+
+def create_partition(cur, month):
+    """Create the partition of `month`, moving its rows out of the default partition.
+
+    A partition cannot be attached while the default partition still holds
+    rows in its range, so those are set aside in a temporary table and
+    inserted again once the partition exists.
+    """
+    name = partition_name(month)
+    lower, upper = month, add_months(month, 1)
+    cur.execute(
+        sql.SQL("CREATE TEMP TABLE moved_rows (LIKE {}) ON COMMIT DROP").format(
+            sql.Identifier(PARENT_TABLE)
+        )
+    )
+    cur.execute(
+        sql.SQL(
+            "WITH moved AS (DELETE FROM {} WHERE dt >= %s AND dt < %s RETURNING *) "
+            "INSERT INTO moved_rows SELECT * FROM moved"
+        ).format(sql.Identifier(DEFAULT_PARTITION)),
+        (lower, upper),
+    )
+    moved = cur.rowcount
+    cur.execute(
+        sql.SQL("CREATE TABLE {} PARTITION OF {} FOR VALUES FROM (%s) TO (%s)").format(
+            sql.Identifier(name), sql.Identifier(PARENT_TABLE)
+        ),
+        (lower, upper),
+    )
+    cur.execute(
+        sql.SQL("INSERT INTO {} SELECT * FROM moved_rows").format(
+            sql.Identifier(PARENT_TABLE)
+        )
+    )
+    cur.execute("DROP TABLE moved_rows")
+    logger.info(
+        f"Created partition {name} with {moved} rows from the default partition"
+    )
+
+
+def ensure_partitions(conn, months_ahead=3, oldest=None):
+    """Create the monthly partitions from the current month to `months_ahead` ahead.
+
+    Months with rows waiting in the default partition, e.g. from a backfill,
+    get their partitions too, unless they are older than `oldest`.
+    """
+    cur = conn.cursor()
+    try:
+        existing = month_partitions(cur)
+        current = date.today().replace(day=1)
+        months = {add_months(current, offset) for offset in range(months_ahead + 1)}
+
+        cur.execute(
+            sql.SQL("SELECT DISTINCT date_trunc('month', dt)::date FROM {}").format(
+                sql.Identifier(DEFAULT_PARTITION)
+            )
+        )
+        months.update(month for (month,) in cur.fetchall())
+
+        created = 0
+        for month in sorted(months):
+            if month in existing or (oldest and month < oldest):
+                continue
+            create_partition(cur, month)
+            created += 1
+        conn.commit()
+        return created
+    except Exception as e:
+        logger.error(f"Error creating stage partitions: {e}")
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def apply_retention(conn, keep_months, action="drop"):
+    """Retire the partitions of months older than the last `keep_months` months.
+
+    Partitions are dropped, or detached and kept as standalone tables with
+    `action="detach"`, instead of deleting their rows. Older rows left in
+    the default partition are deleted, and so are the rollups of the retired
+    months. Returns the oldest month kept.
+    """
+    if action not in ("drop", "detach"):
+        raise ValueError(f"Unsupported retention action: {action}")
+
+    oldest = add_months(date.today().replace(day=1), 1 - keep_months)
+    cur = conn.cursor()
+    try:
+        for month, name in sorted(month_partitions(cur).items()):
+            if month >= oldest:
+                continue
+            if action == "detach":
+                cur.execute(
+                    sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(
+                        sql.Identifier(PARENT_TABLE), sql.Identifier(name)
+                    )
+                )
+                logger.info(f"Retention: detached partition {name}")
+            else:
+                cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+                logger.info(f"Retention: dropped partition {name}")
+
+        cur.execute(
+            sql.SQL("DELETE FROM {} WHERE dt < %s").format(
+                sql.Identifier(DEFAULT_PARTITION)
+            ),
+            (oldest,),
+        )
+        for table in ROLLUP_TABLES:
+            cur.execute(f"DELETE FROM {table} WHERE day < %s", (oldest,))
+        conn.commit()
+        return oldest
+    except Exception as e:
+        logger.error(f"Error applying stage retention: {e}")
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def main():
+    """Retire expired stage_earthquakes partitions and create upcoming ones."""
+    months_ahead = int(os.getenv("STAGE_PARTITION_MONTHS_AHEAD", "3"))
+    keep_months = int(os.getenv("STAGE_RETENTION_MONTHS", "0"))
+    action = os.getenv("STAGE_RETENTION_ACTION", "drop").lower()
+
+    with get_connection() as conn:
+        oldest = apply_retention(conn, keep_months, action) if keep_months else None
+        created = ensure_partitions(conn, months_ahead, oldest)
+    logger.info(f"Stage partitions are ready ({created} created)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import logging
+from datetime import datetime, timedelta
+
+from app.data.utils import get_connection
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Width of the magnitude histogram bins in stats_magnitude_bins
+MAGNITUDE_BIN_WIDTH = 0.1
+
+# Rollups of stage_earthquakes, one set of rows per day of dt
+ROLLUP_TABLES = ["stats_daily", "stats_region_daily", "stats_magnitude_bins"]
+
+# Stage rows of the days in the %s date array, read day by day through the dt index
+_DAY_ROWS_SQL = """
+    FROM unnest(%s::date[]) AS d(day)
+    JOIN stage_earthquakes s ON s.dt >= d.day AND s.dt < d.day + 1
+"""
+
+_REFRESH_SQL = [
+    f"""
+    INSERT INTO stats_daily (
+        day, event_count, magnitude_count, magnitude_sum, magnitude_min,
+        magnitude_max, depth_count, depth_sum, first_dt, last_dt
+    )
+    SELECT
+        d.day, COUNT(*), COUNT(s.magnitude), SUM(s.magnitude), MIN(s.magnitude),
+        MAX(s.magnitude), COUNT(s.depth), SUM(s.depth), MIN(s.dt), MAX(s.dt)
+    {_DAY_ROWS_SQL}
+    GROUP BY d.day
+    ON CONFLICT (day) DO UPDATE SET
+        event_count = EXCLUDED.event_count,
+        magnitude_count = EXCLUDED.magnitude_count,
+        magnitude_sum = EXCLUDED.magnitude_sum,
+        magnitude_min = EXCLUDED.magnitude_min,
+        magnitude_max = EXCLUDED.magnitude_max,
+        depth_count = EXCLUDED.depth_count,
+        depth_sum = EXCLUDED.depth_sum,
+        first_dt = EXCLUDED.first_dt,
+        last_dt = EXCLUDED.last_dt
+    """,
+    f"""
+    INSERT INTO stats_region_daily (day, region_id, event_count)
+    SELECT d.day, s.region_id, COUNT(*)
+    {_DAY_ROWS_SQL}
+    WHERE s.region_id IS NOT NULL
+    GROUP BY d.day, s.region_id
+    ON CONFLICT (day, region_id) DO UPDATE SET event_count = EXCLUDED.event_count
+    """,
+    # Binned as numeric, so that e.g. 2.3 falls in bin 23 and not in bin 22
+    f"""
+    INSERT INTO stats_magnitude_bins (day, bin, event_count)
+    SELECT d.day, floor(s.magnitude::numeric / {MAGNITUDE_BIN_WIDTH})::int AS bin, COUNT(*)
+    {_DAY_ROWS_SQL}
+    WHERE s.magnitude IS NOT NULL AND s.magnitude <> 'NaN'
+    GROUP BY d.day, bin
+    ON CONFLICT (day, bin) DO UPDATE SET event_count = EXCLUDED.event_count
+    """,
+]
+
+
+def stage_days(start_datetime, end_datetime):
+    """Return the dates of the days in the half-open range [start, end)."""
+    day = start_datetime.date()
+    days = []
+    while datetime.combine(day, datetime.min.time()) < end_datetime:
+        days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def clear_rollups(cur, days):
+    """Delete the rollup rows of `days`, for when their stage rows are deleted."""
+    for table in ROLLUP_TABLES:
+        cur.execute(f"DELETE FROM {table} WHERE day = ANY(%s::date[])", (list(days),))
+
+
+def refresh_rollups(cur, days):
+    """Recompute the rollup rows of `days` from their stage_earthquakes rows.
+
+    Run in the transaction that changed the stage rows of those days, so
+    the rollups commit together with them. Only the given days are read.
+    """
+    days = sorted(set(days))
+    if not days:
+        return
+    clear_rollups(cur, days)
+    for refresh_sql in _REFRESH_SQL:
+        cur.execute(refresh_sql, (days,))
+
+
+def read_summary(conn):
+    """Return the overall statistics of the staged earthquakes from the rollups.
+
+    Averages are weighted from the daily sums and counts, so the result
+    matches aggregating stage_earthquakes itself while reading one row per
+    day. Returns None while nothing is staged.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT
+            SUM(event_count)::bigint,
+            SUM(magnitude_sum) / NULLIF(SUM(magnitude_count), 0),
+            MAX(magnitude_max),
+            MIN(magnitude_min),
+            SUM(depth_sum) / NULLIF(SUM(depth_count), 0),
+            MIN(first_dt),
+            MAX(last_dt),
+            (SELECT COUNT(DISTINCT region_id) FROM stats_region_daily)
+        FROM stats_daily
+        """)
+    row = cur.fetchone()
+    cur.close()
+    if row[0] is None:
+        return None
+    keys = [
+        "total_earthquakes",
+        "avg_magnitude",
+        "max_magnitude",
+        "min_magnitude",
+        "avg_depth",
+        "earliest_date",
+        "latest_date",
+        "region_count",
+    ]
+    return dict(zip(keys, row))
+
+
+def top_regions(conn, limit=3):
+    """Return the names of the `limit` regions with the most staged earthquakes."""
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT r.name
+        FROM (
+            SELECT region_id, SUM(event_count) AS events
+            FROM stats_region_daily
+            GROUP BY region_id
+            ORDER BY events DESC
+            LIMIT %s
+        ) top
+        JOIN regions r ON r.id = top.region_id
+        ORDER BY top.events DESC
+        """,
+        (limit,),
+    )
+    names = [name for (name,) in cur.fetchall()]
+    cur.close()
+    return names
+
+
+def rebuild_rollups(conn):
+    """Recompute every rollup row from stage_earthquakes, e.g. after editing it by hand."""
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT DISTINCT dt::date FROM stage_earthquakes")
+        days = [day for (day,) in cur.fetchall()]
+        for table in ROLLUP_TABLES:
+            cur.execute(f"DELETE FROM {table}")
+        refresh_rollups(cur, days)
+        conn.commit()
+        return len(days)
+    except Exception as e:
+        logger.error(f"Error rebuilding stage rollups: {e}")
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def main():
+    """Rebuild the stage_earthquakes rollup tables from scratch."""
+    with get_connection() as conn:
+        days = rebuild_rollups(conn)
+    logger.info(f"Rebuilt the stage rollups of {days} days")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import logging
+import time
+
+import psycopg2
+from psycopg2 import sql
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def check_swappable(cur, table):
+    """Raise ValueError if views or foreign keys depend on `table`.
+
+    Dropping the old table at the swap would fail on them, or would drop
+    foreign keys the shadow does not copy, so this is checked before any
+    work is done.
+    """
+    cur.execute(
+        """
+        SELECT DISTINCT v.oid::regclass::text
+        FROM pg_depend d
+        JOIN pg_rewrite r ON r.oid = d.objid
+        JOIN pg_class v ON v.oid = r.ev_class
+        WHERE d.refobjid = %s::regclass AND v.oid <> %s::regclass
+        UNION
+        SELECT conname
+        FROM pg_constraint
+        WHERE contype = 'f' AND (conrelid = %s::regclass OR confrelid = %s::regclass)
+        """,
+        (table, table, table, table),
+    )
+    dependents = sorted(name for (name,) in cur.fetchall())
+    if dependents:
+        raise ValueError(
+            f"Cannot swap {table}, views or foreign keys depend on it: "
+            f"{', '.join(dependents)}"
+        )
+
+
+def create_shadow_table(cur, table, shadow):
+    """Create an empty, unlogged copy of `table` without its indexes.
+
+    Column types, defaults, generated columns and check constraints are
+    copied; indexes are built by `build_shadow_indexes` once the shadow is
+    filled, which is much cheaper than maintaining them row by row.
+    """
+    cur.execute(
+        sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(shadow)),
+    )
+    cur.execute(
+        sql.SQL(
+            "CREATE UNLOGGED TABLE {} (LIKE {} INCLUDING DEFAULTS "
+            "INCLUDING GENERATED INCLUDING IDENTITY INCLUDING CONSTRAINTS)"
+        ).format(sql.Identifier(shadow), sql.Identifier(table))
+    )
+
+
+def _indexes(cur, table):
+    """Return (name, definition, constraint name, constraint type) for each index."""
+    cur.execute(
+        """
+        SELECT i.relname, pg_get_indexdef(i.oid), c.conname, c.contype
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        LEFT JOIN pg_constraint c
+            ON c.conindid = x.indexrelid AND c.conrelid = x.indrelid
+        WHERE x.indrelid = %s::regclass
+        ORDER BY i.relname
+        """,
+        (table,),
+    )
+    return cur.fetchall()
+
+
+def _shadow_index_name(shadow, position):
+    return f"{shadow}_idx{position}"
+
+
+def build_shadow_indexes(cur, table, shadow):
+    """Build every index of `table` on the filled shadow table, then analyze it."""
+    for position, (name, definition, _, _) in enumerate(_indexes(cur, table)):
+        # pg_get_indexdef gives "CREATE [UNIQUE] INDEX name ON schema.table USING ..."
+        head, tail = definition.split(" ON ", 1)
+        tail = tail.split(" USING ", 1)[1]
+        cur.execute(
+            sql.SQL("{} {} ON {} USING ")
+            .format(
+                sql.SQL(head.rsplit(" ", 1)[0]),
+                sql.Identifier(_shadow_index_name(shadow, position)),
+                sql.Identifier(shadow),
+            )
+            .as_string(cur)
+            + tail
+        )
+    cur.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(shadow)))
+
+
+def _lock_for_swap(cur, table, lock_timeout, attempts):
+    """Take the ACCESS EXCLUSIVE lock for the swap without queueing readers for long."""
+    cur.execute("SET LOCAL lock_timeout = %s", (f"{int(lock_timeout * 1000)}ms",))
+    for attempt in range(1, attempts + 1):
+        cur.execute("SAVEPOINT swap_lock")
+        try:
+            cur.execute(
+                sql.SQL("LOCK TABLE {} IN ACCESS EXCLUSIVE MODE").format(
+                    sql.Identifier(table)
+                )
+            )
+            cur.execute("RELEASE SAVEPOINT swap_lock")
+            return
+        except psycopg2.errors.LockNotAvailable:
+            cur.execute("ROLLBACK TO SAVEPOINT swap_lock")
+            if attempt == attempts:
+                raise
+            logger.warning(
+                f"Could not lock {table} for the swap, retrying "
+                f"(attempt {attempt} of {attempts})"
+            )
+            time.sleep(attempt)
+
+
+def swap_tables(cur, table, shadow, lock_timeout=2.0, attempts=5):
+    """Replace `table` by the filled and indexed `shadow` in the current transaction.
+
+    The shadow is made crash-safe first, then the swap itself only renames
+    objects, so readers wait at most for the lock and never see a partial
+    table. Owned sequences, index names and primary key or unique
+    constraints carry over to the new table.
+    """
+    indexes = _indexes(cur, table)
+    cur.execute(sql.SQL("ALTER TABLE {} SET LOGGED").format(sql.Identifier(shadow)))
+
+    _lock_for_swap(cur, table, lock_timeout, attempts)
+
+    # Sequences owned by the old table would be dropped along with it
+    cur.execute(
+        """
+        SELECT s.oid::regclass::text, a.attname
+        FROM pg_depend d
+        JOIN pg_class s ON s.oid = d.objid AND s.relkind = 'S'
+        JOIN pg_attribute a ON a.attrelid = d.refobjid AND a.attnum = d.refobjsubid
+        WHERE d.refobjid = %s::regclass AND d.deptype IN ('a', 'i')
+        """,
+        (table,),
+    )
+    for sequence, column in cur.fetchall():
+        cur.execute(
+            sql.SQL("ALTER SEQUENCE {} OWNED BY {}.{}").format(
+                sql.SQL(sequence), sql.Identifier(shadow), sql.Identifier(column)
+            )
+        )
+
+    cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(table)))
+    cur.execute(
+        sql.SQL("ALTER TABLE {} RENAME TO {}").format(
+            sql.Identifier(shadow), sql.Identifier(table)
+        )
+    )
+
+    constraint_kinds = {"p": "PRIMARY KEY", "u": "UNIQUE"}
+    for position, (name, _, constraint, kind) in enumerate(indexes):
+        shadow_index = sql.Identifier(_shadow_index_name(shadow, position))
+        if kind in constraint_kinds:
+            cur.execute(
+                sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} {} USING INDEX {}").format(
+                    sql.Identifier(table),
+                    sql.Identifier(constraint),
+                    sql.SQL(constraint_kinds[kind]),
+                    shadow_index,
+                )
+            )
+        else:
+            cur.execute(
+                sql.SQL("ALTER INDEX {} RENAME TO {}").format(
+                    shadow_index, sql.Identifier(name)
+                )
+            )
+    logger.info(f"Swapped {shadow} in as {table}")
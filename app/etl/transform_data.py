@@ -1,7 +1,22 @@
+import io
 import os
-import psycopg2
 import logging
-from datetime import datetime, timedelta
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+import pandas as pd
+from dateutil.tz import tzlocal
+
+from app.data.utils import get_connection
+from app.etl.stage_rollups import (
+    clear_rollups,
+    read_summary,
+    refresh_rollups,
+    stage_days,
+)
 
 # Configure logging
 logging.basicConfig(
@@ -10,13 +25,18 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def delete_old_records(conn, start_date, end_date):
-    """Delete old records from the stage_earthquake table within a date range."""
+def delete_old_records(conn, start_date, end_date, commit=True):
+    """Delete old records from the stage_earthquake table within a date range.
+
+    The rollups of the range's days are deleted with them. With `commit`
+    false the deletion is left in the open transaction, for a transform to
+    commit together with the rows that replace them.
+    """
     try:
         logger.info(f"Deleting old records between {start_date} and {end_date}")
         delete_query = """
             DELETE FROM stage_earthquakes 
-            WHERE dt BETWEEN %s AND %s
+            WHERE dt >= %s AND dt < %s
         """
         cur = conn.cursor()
         # Convert date strings to datetime objects
@@ -24,7 +44,9 @@ def delete_old_records(conn, start_date, end_date):
         end_datetime = datetime.fromisoformat(end_date) + timedelta(days=1)
         cur.execute(delete_query, (start_datetime, end_datetime))
         deleted_count = cur.rowcount
-        conn.commit()
+        clear_rollups(cur, stage_days(start_datetime, end_datetime))
+        if commit:
+            conn.commit()
         cur.close()
         logger.info(f"Deleted {deleted_count} old records")
     except Exception as e:
@@ -33,34 +55,254 @@ def delete_old_records(conn, start_date, end_date):
         raise
 
 
-def transform_earthquake(conn, start_date, end_date):
-    """Transform earthquake data and load it into the stage_earthquakes table with explicit timestamp handling."""
+def split_place(place):
+    """Split a USGS place string into (region, location).
+
+    "10 km NE of Ridgecrest, CA" gives ("10 km NE", "Ridgecrest, CA"),
+    "Ridgecrest, CA" gives ("CA", "Ridgecrest"), and anything else,
+    including a missing place, has an "Unknown" region.
+    """
+    if place is None:
+        return "Unknown", None
+    if " of " in place:
+        region = place.split(" of ")[0].strip()
+        location = place.split(" of ")[1].strip()
+    elif "," in place:
+        location = place.split(",")[0].strip()
+        region = place.split(",")[-1].strip()
+    else:
+        region = "Unknown"
+        location = place
+    return region, location
+
+
+class RegionResolver:
+    """Memoized place parsing backed by the regions dimension table.
+
+    `resolve` maps a raw place string to (region_id, location) through an
+    in-process LRU cache of REGION_CACHE_SIZE places, and region names get
+    their id from the table once each. Missing regions are added and
+    committed right away on a connection of their own, so the cached ids
+    survive a rollback of the transform and concurrent transforms never wait
+    on each other's regions.
+    """
+
+    def __init__(self, cache_size=None):
+        self._region_ids = {}
+        cache_size = cache_size or int(os.getenv("REGION_CACHE_SIZE", "10000"))
+        self.resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def _resolve(self, place):
+        region, location = split_place(place)
+        return self.region_id(region), location
+
+    def region_id(self, name):
+        """Return the id of the named region, adding it to regions if it is new."""
+        if name not in self._region_ids:
+            with get_connection() as conn:
+                cur = conn.cursor()
+                cur.execute("SELECT id FROM regions WHERE name = %s", (name,))
+                row = cur.fetchone()
+                if row is None:
+                    # A concurrent transform may add the same region first
+                    cur.execute(
+                        "INSERT INTO regions (name) VALUES (%s) "
+                        "ON CONFLICT (name) DO NOTHING RETURNING id",
+                        (name,),
+                    )
+                    row = cur.fetchone()
+                    if row is None:
+                        cur.execute("SELECT id FROM regions WHERE name = %s", (name,))
+                        row = cur.fetchone()
+                conn.commit()
+                cur.close()
+            self._region_ids[name] = row[0]
+        return self._region_ids[name]
+
+
+# SQL equivalents of split_place; btrim gets the whitespace str.strip() removes
+_WHITESPACE = r"E' \t\n\r\f\x0B'"
+REGION_SQL = f"""
+    CASE
+        WHEN strpos(place, ' of ') > 0 THEN btrim(split_part(place, ' of ', 1), {_WHITESPACE})
+        WHEN strpos(place, ',') > 0 THEN btrim(split_part(place, ',', -1), {_WHITESPACE})
+        ELSE 'Unknown'
+    END
+"""
+LOCATION_SQL = f"""
+    CASE
+        WHEN strpos(place, ' of ') > 0 THEN btrim(split_part(place, ' of ', 2), {_WHITESPACE})
+        WHEN strpos(place, ',') > 0 THEN btrim(split_part(place, ',', 1), {_WHITESPACE})
+        ELSE place
+    END
+"""
+
+
+# Range filter on the raw millisecond times, comparable to the time index.
+# The range is half-open, so consecutive ranges never share an event, and
+# its bounds are converted in the session time zone.
+TIME_RANGE_SQL = """
+    time >= extract(epoch FROM %s::timestamptz)::bigint * 1000
+    AND time < extract(epoch FROM %s::timestamptz)::bigint * 1000
+"""
+
+FETCH_SQL = f"""
+    SELECT time, place, magnitude, latitude, longitude, depth, id
+    FROM earthquakes
+    WHERE {TIME_RANGE_SQL}
+"""
+
+
+# Columns written to stage_earthquakes by the transforms, in COPY order
+STAGE_COLUMNS = [
+    "dt",
+    "region_id",
+    "place",
+    "magnitude",
+    "latitude",
+    "longitude",
+    "depth",
+    "raw_time",
+    "earthquake_id",
+]
+
+# Stage rows computed from earthquakes rows, in STAGE_COLUMNS order. The
+# regions of the rows must have been added with `insert_regions` first.
+TRANSFORM_SELECT_SQL = f"""
+    SELECT
+        to_timestamp(time / 1000.0)::timestamp AS dt,
+        r.id AS region_id,
+        {LOCATION_SQL} AS place,
+        magnitude, latitude, longitude, depth,
+        time AS raw_time,
+        e.id AS earthquake_id
+    FROM earthquakes e
+    LEFT JOIN regions r ON r.name = {REGION_SQL}
+"""
+
+
+# Stage rows of the earthquakes in a time range, for the "sql" transform
+TRANSFORM_INSERT_SQL = f"""
+    INSERT INTO stage_earthquakes ({", ".join(STAGE_COLUMNS)})
+    {TRANSFORM_SELECT_SQL}
+    WHERE {TIME_RANGE_SQL}
+"""
+
+# Replaces the stage rows of the earthquakes written since a change_xid mark.
+# One statement, so the delete and the insert see the same changes; it
+# returns the merged row count and the days the rows left or joined.
+INCREMENTAL_MERGE_SQL = f"""
+    WITH changed AS (
+        {TRANSFORM_SELECT_SQL}
+        WHERE change_xid >= %s
+    ), replaced AS (
+        DELETE FROM stage_earthquakes s
+        USING changed c
+        WHERE s.earthquake_id = c.earthquake_id
+        RETURNING s.dt
+    ), inserted AS (
+        INSERT INTO stage_earthquakes ({", ".join(STAGE_COLUMNS)})
+        SELECT {", ".join(STAGE_COLUMNS)} FROM changed
+        RETURNING dt
+    )
+    SELECT
+        (SELECT COUNT(*) FROM inserted),
+        ARRAY(
+            SELECT dt::date FROM replaced
+            UNION
+            SELECT dt::date FROM inserted
+        )
+"""
+
+
+def insert_regions(cur, where_sql, params):
+    """Add the regions of the earthquakes matching `where_sql` that regions lacks.
+
+    Names are inserted in sorted order, so concurrent transforms adding the
+    same new regions wait for each other instead of deadlocking.
+    """
+    cur.execute(
+        f"""
+        INSERT INTO regions (name)
+        SELECT DISTINCT region
+        FROM (SELECT {REGION_SQL} AS region FROM earthquakes WHERE {where_sql}) e
+        WHERE NOT EXISTS (SELECT 1 FROM regions r WHERE r.name = e.region)
+        ORDER BY region
+        ON CONFLICT (name) DO NOTHING
+        """,
+        params,
+    )
+
+
+def transform_earthquake_sql(conn, start_date, end_date):
+    """Transform earthquake data into stage_earthquakes with one INSERT ... SELECT.
+
+    Timestamp conversion and place parsing run inside PostgreSQL, giving
+    the same rows as `transform_earthquake` without moving any data through
+    Python. Timestamps are converted in the session time zone, which is
+    also the server's local time. The range's rollups are refreshed in the
+    same transaction.
+    """
     try:
-        logger.info(f"Transforming earthquake data between {start_date} and {end_date}")
+        logger.info(
+            f"Transforming earthquake data in SQL between {start_date} and {end_date}"
+        )
         start_datetime = datetime.fromisoformat(start_date)
         end_datetime = datetime.fromisoformat(end_date) + timedelta(days=1)
 
-        # First, let's fetch the earthquake data
-        fetch_sql = """
-            SELECT time, place, magnitude, latitude, longitude, depth
-            FROM earthquakes 
-            WHERE to_timestamp(time / 1000) >= %s AND to_timestamp(time / 1000) <= %s
-        """
+        cur = conn.cursor()
+        insert_regions(cur, TIME_RANGE_SQL, (start_datetime, end_datetime))
+        cur.execute(TRANSFORM_INSERT_SQL, (start_datetime, end_datetime))
+        records_inserted = cur.rowcount
+        refresh_rollups(cur, stage_days(start_datetime, end_datetime))
+        conn.commit()
+        cur.close()
+
+        logger.info(f"Transformed and loaded {records_inserted} records")
+        return records_inserted
+    except Exception as e:
+        logger.error(f"Error in transform_earthquake_sql: {e}")
+        conn.rollback()
+        raise
+
+
+def open_range_cursor(conn, start_datetime, end_datetime, itersize=None):
+    """Run FETCH_SQL for the range on a named, server-side cursor.
+
+    Rows stay on the server until fetched, `itersize` (TRANSFORM_BATCH_SIZE
+    by default) at a time, so client memory is bounded by one batch however
+    long the range is. The cursor is closed when the transaction ends.
+    """
+    read_cur = conn.cursor(name="transform_read")
+    read_cur.itersize = itersize or int(os.getenv("TRANSFORM_BATCH_SIZE", "50000"))
+    read_cur.execute(FETCH_SQL, (start_datetime, end_datetime))
+    return read_cur
+
+
+def transform_earthquake(conn, start_date, end_date, batch_size=None):
+    """Transform earthquake data and load it into the stage_earthquakes table with explicit timestamp handling.
+
+    Rows are read from a server-side cursor and each fetched batch is
+    transformed and inserted before the next one is pulled.
+    """
+    try:
+        logger.info(f"Transforming earthquake data between {start_date} and {end_date}")
+        start_datetime = datetime.fromisoformat(start_date)
+        end_datetime = datetime.fromisoformat(end_date) + timedelta(days=1)
 
         # Log the SQL query for debugging
-        logger.info(f"Fetch SQL: {fetch_sql}")
+        logger.info(f"Fetch SQL: {FETCH_SQL}")
         logger.info(f"Date range parameters: {start_datetime} to {end_datetime}")
 
+        # Stream the earthquake data from the server a batch at a time
+        read_cur = open_range_cursor(conn, start_datetime, end_datetime, batch_size)
         cur = conn.cursor()
-        cur.execute(fetch_sql, (start_datetime, end_datetime))
-
-        rows = cur.fetchall()
-        logger.info(f"Fetched {len(rows)} earthquake records")
+        regions = RegionResolver()
 
         # Now insert the transformed data one by one
         records_inserted = 0
-        for row in rows:
-            time_ms, place, magnitude, latitude, longitude, depth = row
+        for row in read_cur:
+            time_ms, place, magnitude, latitude, longitude, depth, earthquake_id = row
 
             # Transform the timestamp (milliseconds since epoch) to a datetime
             # This is equivalent to: SELECT to_timestamp(time / 1000) in SQL
@@ -79,27 +321,30 @@ def transform_earthquake(conn, start_date, end_date):
                 # Use current time as fallback
                 dt = datetime.now()
 
-            # Extract region and location from place
-            if " of " in place:
-                region = place.split(" of ")[0].strip()
-                location = place.split(" of ")[1].strip()
-            elif "," in place:
-                location = place.split(",")[0].strip()
-                region = place.split(",")[-1].strip()
-            else:
-                region = "Unknown"
-                location = place
+            # Extract region and location from place, once per distinct place
+            region_id, location = regions.resolve(place)
 
             # Insert into stage table
             insert_sql = """
                 INSERT INTO stage_earthquakes 
-                (dt, region, place, magnitude, latitude, longitude, depth, raw_time)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                (dt, region_id, place, magnitude, latitude, longitude, depth, raw_time,
+                 earthquake_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
             """
 
             cur.execute(
                 insert_sql,
-                (dt, region, location, magnitude, latitude, longitude, depth, time_ms),
+                (
+                    dt,
+                    region_id,
+                    location,
+                    magnitude,
+                    latitude,
+                    longitude,
+                    depth,
+                    time_ms,
+                    earthquake_id,
+                ),
             )
             records_inserted += 1
 
@@ -107,6 +352,8 @@ def transform_earthquake(conn, start_date, end_date):
             if records_inserted % 1000 == 0:
                 logger.info(f"Processed {records_inserted} records so far...")
 
+        read_cur.close()
+        refresh_rollups(cur, stage_days(start_datetime, end_datetime))
         conn.commit()
         cur.close()
 
@@ -127,6 +374,355 @@ def transform_earthquake(conn, start_date, end_date):
         raise
 
 
+def split_places(places):
+    """Vectorized `split_place` over a Series, returning (region, location) Series."""
+    places = places.astype(object)
+    has_of = places.str.contains(" of ", regex=False, na=False)
+    has_comma = ~has_of & places.str.contains(",", regex=False, na=False)
+
+    of_parts = places.str.partition(" of ")
+    region = pd.Series("Unknown", index=places.index, dtype=object)
+    region = region.mask(has_of, of_parts[0].str.strip())
+    region = region.mask(has_comma, places.str.rpartition(",")[2].str.strip())
+
+    # The location is the text between the first and any second " of "
+    location = places.mask(has_of, of_parts[2].str.partition(" of ")[0].str.strip())
+    location = location.mask(has_comma, places.str.partition(",")[0].str.strip())
+    return region, location
+
+
+def transform_frame(df, regions, now=None):
+    """Vectorized version of the per-row conversion in `transform_earthquake`.
+
+    Millisecond times become naive local datetimes, as with
+    datetime.fromtimestamp. Times that are missing or cannot be converted
+    get `now` (the current local time by default) instead of failing the
+    row. Region names are replaced by their ids from the `regions`
+    RegionResolver, looked up once per distinct name.
+    """
+    now = now or datetime.now()
+    time_ms = pd.to_numeric(df["time"], errors="coerce")
+    dt = (
+        pd.to_datetime(time_ms, unit="ms", utc=True, errors="coerce")
+        .dt.tz_convert(tzlocal())
+        .dt.tz_localize(None)
+        .fillna(pd.Timestamp(now))
+    )
+    region, location = split_places(df["place"])
+    codes, names = pd.factorize(region)
+    region_id = pd.Series(
+        [regions.region_id(name) for name in names], dtype="int64"
+    ).take(codes)
+
+    return pd.DataFrame(
+        {
+            "dt": dt,
+            "region_id": region_id.to_numpy(),
+            "place": location,
+            "magnitude": df["magnitude"],
+            "latitude": df["latitude"],
+            "longitude": df["longitude"],
+            "depth": df["depth"],
+            "raw_time": time_ms.astype("Int64"),
+            "earthquake_id": df["id"],
+        },
+        columns=STAGE_COLUMNS,
+    )
+
+
+def copy_to_stage(cur, frame):
+    """Write a transformed frame to stage_earthquakes with one COPY."""
+    buffer = io.StringIO()
+    # An explicit NULL marker keeps empty place strings distinct from NULLs
+    frame.to_csv(buffer, index=False, header=False, na_rep="\\N")
+    buffer.seek(0)
+    cur.copy_expert(
+        f"COPY stage_earthquakes ({', '.join(STAGE_COLUMNS)}) "
+        "FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+        buffer,
+    )
+
+
+def transform_earthquake_vectorized(conn, start_date, end_date, batch_size=None):
+    """Transform earthquake data with pandas, batch by batch, and COPY it to the stage table.
+
+    Each fetched batch of TRANSFORM_BATCH_SIZE rows is converted with
+    whole-column operations and written with a single COPY, instead of
+    per-row Python and INSERTs.
+    """
+    try:
+        logger.info(
+            f"Transforming earthquake data with pandas between {start_date} and {end_date}"
+        )
+        start_datetime = datetime.fromisoformat(start_date)
+        end_datetime = datetime.fromisoformat(end_date) + timedelta(days=1)
+
+        columns = ["time", "place", "magnitude", "latitude", "longitude", "depth", "id"]
+        now = datetime.now()
+
+        read_cur = open_range_cursor(conn, start_datetime, end_datetime, batch_size)
+        write_cur = conn.cursor()
+        regions = RegionResolver()
+
+        records_inserted = 0
+        while True:
+            rows = read_cur.fetchmany(read_cur.itersize)
+            if not rows:
+                break
+            frame = transform_frame(pd.DataFrame(rows, columns=columns), regions, now)
+            copy_to_stage(write_cur, frame)
+            records_inserted += len(frame)
+            logger.info(f"Processed {records_inserted} records so far...")
+
+        read_cur.close()
+        refresh_rollups(write_cur, stage_days(start_datetime, end_datetime))
+        conn.commit()
+        write_cur.close()
+
+        logger.info(f"Transformed and loaded {records_inserted} records")
+        return records_inserted
+    except Exception as e:
+        logger.error(f"Error in transform_earthquake_vectorized: {e}")
+        conn.rollback()
+        raise
+
+
+# Transform implementations selectable with TRANSFORM_MODE
+TRANSFORMS = {
+    "sql": transform_earthquake_sql,
+    "vectorized": transform_earthquake_vectorized,
+    "python": transform_earthquake,
+}
+
+
+# Row of the stage_earthquakes transform in transform_checkpoints
+CHECKPOINT_NAME = "stage_earthquakes"
+
+
+def xid_horizon(conn):
+    """Return the oldest transaction id still running on the server.
+
+    Every earthquakes row with a lower change_xid was committed before this
+    call, so once a transform has read them they never need reading again.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+    horizon = cur.fetchone()[0]
+    cur.close()
+    return horizon
+
+
+def get_transform_checkpoint(conn):
+    """Return the change_xid mark left by the last transform, or None before the first."""
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT change_xid FROM transform_checkpoints WHERE name = %s",
+        (CHECKPOINT_NAME,),
+    )
+    row = cur.fetchone()
+    cur.close()
+    return row[0] if row else None
+
+
+def save_transform_checkpoint(conn, change_xid, rows_transformed):
+    """Record the change_xid mark the next incremental transform starts from."""
+    cur = conn.cursor()
+    cur.execute(
+        """
+        INSERT INTO transform_checkpoints (name, change_xid, rows_transformed, updated_at)
+        VALUES (%s, %s, %s, now())
+        ON CONFLICT (name) DO UPDATE SET
+            change_xid = EXCLUDED.change_xid,
+            rows_transformed = EXCLUDED.rows_transformed,
+            updated_at = EXCLUDED.updated_at
+        """,
+        (CHECKPOINT_NAME, change_xid, rows_transformed),
+    )
+    cur.close()
+
+
+def transform_earthquake_incremental(conn, since_xid):
+    """Merge the earthquakes written since the `since_xid` mark into stage_earthquakes.
+
+    Every earthquake inserted or rewritten by a load since the last run,
+    whatever its event date, has its stage rows replaced by freshly
+    transformed ones, so late-arriving events and updates to old ones are
+    picked up. Loads still running are caught by the next run. The new mark
+    and the rollups of every day that lost or gained rows are saved in the
+    same transaction as the rows.
+    """
+    try:
+        logger.info(f"Transforming earthquakes written since transaction {since_xid}")
+        horizon = xid_horizon(conn)
+        cur = conn.cursor()
+        insert_regions(cur, "change_xid >= %s", (since_xid,))
+        cur.execute(INCREMENTAL_MERGE_SQL, (since_xid,))
+        records_merged, days = cur.fetchone()
+        refresh_rollups(cur, days)
+        cur.close()
+
+        save_transform_checkpoint(conn, horizon, records_merged)
+        conn.commit()
+
+        logger.info(f"Merged {records_merged} new or updated records")
+        return records_merged
+    except Exception as e:
+        logger.error(f"Error in transform_earthquake_incremental: {e}")
+        conn.rollback()
+        raise
+
+
+# First key of the advisory locks held on stage_earthquakes day partitions
+PARTITION_LOCK_KEY = 1803
+
+
+def transform_partition(transform_mode, day):
+    """Rebuild the staged rows of one day on a connection of this worker's own.
+
+    A session advisory lock on the day keeps concurrent runs from
+    rebuilding the same partition at the same time. The old rows are
+    deleted in the transform's transaction, so readers never see the day
+    empty and a failed transform leaves it as it was. Returns the day, rows
+    and run time of the partition for the caller's report.
+    """
+    started = time.perf_counter()
+    lock_key = (PARTITION_LOCK_KEY, date.fromisoformat(day).toordinal())
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_advisory_lock(%s, %s)", lock_key)
+        try:
+            delete_old_records(conn, day, day, commit=False)
+            rows = TRANSFORMS[transform_mode](conn, day, day)
+        except Exception:
+            # Keep the day's old rows rather than commit their deletion below
+            conn.rollback()
+            raise
+        finally:
+            cur.execute("SELECT pg_advisory_unlock(%s, %s)", lock_key)
+            conn.commit()
+            cur.close()
+    return {
+        "day": day,
+        "rows": rows,
+        "seconds": time.perf_counter() - started,
+        "pid": os.getpid(),
+    }
+
+
+def transform_partitions(transform_mode, start_date, end_date, workers):
+    """Rebuild the date range one day at a time over a pool of worker processes.
+
+    Each worker process has its own connection pool. A failed day does not
+    stop the others, and the per-day results are returned in date order.
+    """
+    first = date.fromisoformat(start_date)
+    days = [
+        (first + timedelta(days=offset)).isoformat()
+        for offset in range((date.fromisoformat(end_date) - first).days + 1)
+    ]
+    logger.info(f"Transforming {len(days)} day partitions with {workers} processes")
+
+    results = []
+    failed = []
+    # Spawned workers do not inherit the parent's pooled connections
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        futures = {
+            executor.submit(transform_partition, transform_mode, day): day
+            for day in days
+        }
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                failed.append(futures[future])
+                logger.error(f"Failed to transform {futures[future]}: {e}")
+
+    if failed:
+        raise RuntimeError(
+            f"Failed to transform {len(failed)} of {len(days)} day partitions"
+        )
+    return sorted(results, key=lambda result: result["day"])
+
+
+def changed_days(conn, since_xid):
+    """Return the days, as ISO dates, that earthquakes written since the mark leave or join.
+
+    A changed earthquake leaves the day of its current stage row and joins
+    the day of its new time, in the session time zone like TIME_RANGE_SQL.
+    """
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT s.dt::date
+        FROM stage_earthquakes s
+        JOIN earthquakes e ON e.id = s.earthquake_id
+        WHERE e.change_xid >= %s
+        UNION
+        SELECT to_timestamp(time / 1000.0)::date
+        FROM earthquakes
+        WHERE change_xid >= %s AND time IS NOT NULL
+        ORDER BY 1
+        """,
+        (since_xid, since_xid),
+    )
+    days = [day.isoformat() for (day,) in cur.fetchall()]
+    cur.close()
+    return days
+
+
+def transform_changed_days(conn, transform_mode, since_xid):
+    """Merge the earthquakes written since the mark by rebuilding the days they touch.
+
+    The incremental path of the "python" and "vectorized" modes: each day
+    is rebuilt whole with the `transform_mode` transform, as a full rebuild
+    would, so every stage row keeps the same conversions whichever way it
+    was written. Returns the rows of the rebuilt days.
+    """
+    horizon = xid_horizon(conn)
+    days = changed_days(conn, since_xid)
+    conn.commit()
+    logger.info(
+        f"Rebuilding {len(days)} days changed since transaction {since_xid} "
+        f"in {transform_mode} mode"
+    )
+
+    rows_transformed = 0
+    for day in days:
+        rows_transformed += transform_partition(transform_mode, day)["rows"]
+
+    save_transform_checkpoint(conn, horizon, rows_transformed)
+    conn.commit()
+    return rows_transformed
+
+
+def rebuild_stage_range(conn, transform_mode, start_date, end_date, workers=1):
+    """Replace the staged rows of the date range and reset the incremental mark.
+
+    With several `workers`, the range is rebuilt as day partitions in
+    parallel processes and their timings are logged.
+    """
+    horizon = xid_horizon(conn)
+
+    if workers > 1:
+        results = pd.DataFrame(
+            transform_partitions(transform_mode, start_date, end_date, workers)
+        )
+        logger.info("Partition results:\n" + results.to_string(index=False))
+        transformed_count = int(results["rows"].sum())
+    else:
+        # Delete old records in the date range, committed with the new ones
+        delete_old_records(conn, start_date, end_date, commit=False)
+
+        # Transform and load data
+        transformed_count = TRANSFORMS[transform_mode](conn, start_date, end_date)
+
+    save_transform_checkpoint(conn, horizon, transformed_count)
+    conn.commit()
+    return transformed_count
+
+
 def calculate_date_range(days=15):
     """Calculate the date range for processing, defaulting to last 15 days."""
     end_date = datetime.now().date()
@@ -135,31 +731,19 @@ def calculate_date_range(days=15):
 
 
 def get_earthquake_stats(conn):
-    """Get statistics on transformed earthquake data."""
+    """Log statistics on transformed earthquake data, read from the daily rollups."""
     try:
-        stats_sql = """
-            SELECT 
-                COUNT(*) as total_earthquakes,
-                AVG(magnitude) as avg_magnitude,
-                MAX(magnitude) as max_magnitude,
-                MIN(dt) as earliest_date,
-                MAX(dt) as latest_date,
-                COUNT(DISTINCT region) as region_count
-            FROM stage_earthquakes
-        """
-        cur = conn.cursor()
-        cur.execute(stats_sql)
-        result = cur.fetchone()
-        cur.close()
+        stats = read_summary(conn)
 
-        if result:
-            total, avg_mag, max_mag, earliest, latest, region_count = result
+        if stats:
             logger.info(f"Earthquake Statistics:")
-            logger.info(f"  Total earthquakes: {total}")
-            logger.info(f"  Average magnitude: {avg_mag:.2f}")
-            logger.info(f"  Maximum magnitude: {max_mag:.2f}")
-            logger.info(f"  Date range: {earliest} to {latest}")
-            logger.info(f"  Regions affected: {region_count}")
+            logger.info(f"  Total earthquakes: {stats['total_earthquakes']}")
+            logger.info(f"  Average magnitude: {stats['avg_magnitude']:.2f}")
+            logger.info(f"  Maximum magnitude: {stats['max_magnitude']:.2f}")
+            logger.info(
+                f"  Date range: {stats['earliest_date']} to {stats['latest_date']}"
+            )
+            logger.info(f"  Regions affected: {stats['region_count']}")
     except Exception as e:
         logger.error(f"Error getting earthquake statistics: {e}")
 
@@ -168,22 +752,41 @@ def ensure_stage_table_exists(conn):
     """Ensure the stage_earthquakes table exists with raw_time column."""
     try:
         logger.info("Checking if stage_earthquakes table exists")
+        create_regions_sql = """
+            CREATE TABLE IF NOT EXISTS regions (
+                id SERIAL PRIMARY KEY,
+                name VARCHAR(255) NOT NULL UNIQUE
+            )
+        """
+        # Partitioned by month, as the migrations create it; rows land in the
+        # default partition until app.etl.stage_partitions adds monthly ones
         create_table_sql = """
             CREATE TABLE IF NOT EXISTS stage_earthquakes (
-                id SERIAL PRIMARY KEY,
-                dt TIMESTAMP,
-                region VARCHAR(255),
+                id SERIAL,
+                dt TIMESTAMP NOT NULL,
+                region_id INTEGER REFERENCES regions (id),
                 place VARCHAR(255),
                 magnitude FLOAT,
                 latitude FLOAT,
                 longitude FLOAT,
                 depth FLOAT,
                 raw_time BIGINT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                earthquake_id INTEGER,
+                PRIMARY KEY (id, dt)
+            ) PARTITION BY RANGE (dt)
         """
         cur = conn.cursor()
+        cur.execute(create_regions_sql)
         cur.execute(create_table_sql)
+        cur.execute(
+            "SELECT relkind FROM pg_class WHERE oid = 'stage_earthquakes'::regclass"
+        )
+        if cur.fetchone()[0] == "p":
+            cur.execute(
+                "CREATE TABLE IF NOT EXISTS stage_earthquakes_default "
+                "PARTITION OF stage_earthquakes DEFAULT"
+            )
 
         # Check if raw_time column exists, if not add it
         check_column_sql = """
@@ -215,6 +818,44 @@ def ensure_stage_table_exists(conn):
             """
             cur.execute(alter_table_sql)
 
+        # Check if earthquake_id column exists, if not add it
+        check_column_sql = """
+            SELECT column_name 
+            FROM information_schema.columns 
+            WHERE table_name = 'stage_earthquakes' AND column_name = 'earthquake_id'
+        """
+        cur.execute(check_column_sql)
+        if not cur.fetchone():
+            logger.info("Adding earthquake_id column to stage_earthquakes table")
+            alter_table_sql = """
+                ALTER TABLE stage_earthquakes 
+                ADD COLUMN earthquake_id INTEGER
+            """
+            cur.execute(alter_table_sql)
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS ix_stage_earthquakes_earthquake_id "
+            "ON stage_earthquakes (earthquake_id)"
+        )
+
+        # Check if region_id column exists, if not add it
+        check_column_sql = """
+            SELECT column_name 
+            FROM information_schema.columns 
+            WHERE table_name = 'stage_earthquakes' AND column_name = 'region_id'
+        """
+        cur.execute(check_column_sql)
+        if not cur.fetchone():
+            logger.info("Adding region_id column to stage_earthquakes table")
+            alter_table_sql = """
+                ALTER TABLE stage_earthquakes 
+                ADD COLUMN region_id INTEGER REFERENCES regions (id)
+            """
+            cur.execute(alter_table_sql)
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS ix_stage_earthquakes_region_id "
+            "ON stage_earthquakes (region_id)"
+        )
+
         conn.commit()
         cur.close()
         logger.info("Stage table is ready with all required columns")
@@ -227,35 +868,43 @@ def ensure_stage_table_exists(conn):
 def main():
     """Main function to transform earthquake data."""
     try:
-        # Database connection parameters
-        db_params = {
-            "dbname": os.getenv("DB_NAME", "earthquake_db"),
-            "user": os.getenv("DB_USER", "postgres"),
-            "password": os.getenv("DB_PASS", "postgres"),
-            "host": os.getenv("DB_HOST", "localhost"),
-            "port": os.getenv("DB_PORT", "5432"),
-        }
-
         # Calculate date range - default to last 15 days
         days_to_process = int(os.getenv("PROCESS_DAYS", "15"))
         start_date, end_date = calculate_date_range(days_to_process)
 
+        # "sql" transforms inside PostgreSQL, "vectorized" in pandas batches,
+        # "python" row by row
+        transform_mode = os.getenv("TRANSFORM_MODE", "sql").lower()
+        if transform_mode not in TRANSFORMS:
+            raise ValueError(f"Unsupported TRANSFORM_MODE: {transform_mode}")
+
+        # Runs only merge what loads wrote since the last one, unless a full
+        # rebuild of the date range is asked for, e.g. to repair the stage table
+        full_rebuild = os.getenv("TRANSFORM_FULL_REBUILD", "false").lower() == "true"
+
+        # Processes that rebuild day partitions in parallel
+        workers = int(os.getenv("TRANSFORM_WORKERS", "1"))
+
         logger.info(
             f"Starting earthquake data transformation for {start_date} to {end_date}"
         )
 
-        # Connect to the PostgreSQL database
-        conn = psycopg2.connect(**db_params)
-
-        try:
+        # Borrow a connection from the shared pool
+        with get_connection() as conn:
             # Ensure stage table exists with all required columns
             ensure_stage_table_exists(conn)
 
-            # Delete old records in the date range
-            delete_old_records(conn, start_date, end_date)
-
-            # Transform and load data
-            transformed_count = transform_earthquake(conn, start_date, end_date)
+            since_xid = None if full_rebuild else get_transform_checkpoint(conn)
+            if since_xid is None:
+                transformed_count = rebuild_stage_range(
+                    conn, transform_mode, start_date, end_date, workers
+                )
+            elif transform_mode == "sql":
+                transformed_count = transform_earthquake_incremental(conn, since_xid)
+            else:
+                transformed_count = transform_changed_days(
+                    conn, transform_mode, since_xid
+                )
 
             # Get statistics on the transformed data
             if transformed_count > 0:
@@ -264,8 +913,6 @@ def main():
             logger.info(
                 f"Transformation completed successfully. Processed {transformed_count} records."
             )
-        finally:
-            conn.close()
 
     except Exception as e:
         logger.error(f"An error occurred during transformation: {e}")
@@ -0,0 +1,175 @@
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Point this at a local stand-in server to exercise the fetch engine offline
+USGS_API_URL = os.getenv(
+    "USGS_API_URL", "https://earthquake.usgs.gov/fdsnws/event/1/query"
+)
+
+# The FDSN service rejects any query matching more events than this
+MAX_EVENTS_PER_QUERY = 20000
+
+# Windows are never halved below this size
+MIN_WINDOW = timedelta(minutes=1)
+
+# Transient HTTP statuses worth retrying with backoff
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class WindowLimitExceeded(Exception):
+    """Raised when a time window matches more events than the API will return."""
+
+
+def create_session(pool_size=4, retries=3):
+    """Create a requests Session with a connection pool sized for the fetch workers.
+
+    Transient errors are retried with exponential backoff.
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        backoff_factor=1,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=["GET"],
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def split_time_range(start, end, window):
+    """Split the range [start, end) into consecutive windows of at most `window`."""
+    windows = []
+    cursor = start
+    while cursor < end:
+        window_end = min(cursor + window, end)
+        windows.append((cursor, window_end))
+        cursor = window_end
+    return windows
+
+
+def build_query(start, end, params=None):
+    """Build the FDSN query parameters for the [start, end) window."""
+    # endtime is inclusive on the server, so stop one millisecond short of the
+    # next window to keep boundary events from being returned twice
+    return {
+        **(params or {}),
+        "format": "geojson",
+        "orderby": "time-asc",
+        "starttime": start.isoformat(timespec="milliseconds"),
+        "endtime": (end - timedelta(milliseconds=1)).isoformat(timespec="milliseconds"),
+    }
+
+
+def is_limit_error(status_code, text):
+    """Return True if a response reports that the query exceeds the event cap."""
+    return status_code == 400 and "limit" in text.lower()
+
+
+def fetch_window(
+    session, start, end, handler, params=None, url=USGS_API_URL, cache=None, timeout=60
+):
+    """Fetch a single [start, end) window and pass the open response to `handler`.
+
+    `params` holds extra FDSN query parameters such as `updatedafter`. With a
+    ResponseCache the request is made conditional and `handler` receives the
+    cached body instead, flagged with whether the server answered 304.
+    """
+    query = build_query(start, end, params)
+    headers = {"Accept-Encoding": "gzip"}
+    if cache is not None:
+        key = cache.key(url, query)
+        headers.update(cache.validators(key))
+
+    response = session.get(
+        url, params=query, headers=headers, timeout=timeout, stream=True
+    )
+    try:
+        if cache is not None and response.status_code == 304:
+            return handler(cache.hit(key))
+        if response.status_code == 400 and is_limit_error(400, response.text):
+            raise WindowLimitExceeded(
+                f"Window {start} to {end} exceeds {MAX_EVENTS_PER_QUERY} events"
+            )
+        response.raise_for_status()
+        if cache is not None:
+            return handler(cache.store(key, url, response))
+        return handler(response)
+    finally:
+        response.close()
+
+
+def fetch_adaptive(
+    session, start, end, handler, params=None, url=USGS_API_URL, cache=None
+):
+    """Fetch a window, halving it until every piece fits under the event cap.
+
+    Returns the handler results for each piece in time order.
+    """
+    try:
+        return [fetch_window(session, start, end, handler, params, url, cache)]
+    except WindowLimitExceeded:
+        if end - start <= MIN_WINDOW:
+            raise
+        middle = start + (end - start) / 2
+        logger.info(f"Window {start} to {end} hit the event cap, splitting at {middle}")
+        return fetch_adaptive(
+            session, start, middle, handler, params, url, cache
+        ) + fetch_adaptive(session, middle, end, handler, params, url, cache)
+
+
+def fetch_time_range(
+    start,
+    end,
+    handler,
+    window=timedelta(days=1),
+    max_workers=4,
+    params=None,
+    url=USGS_API_URL,
+    cache=None,
+):
+    """Fetch [start, end) as concurrent sub-windows and merge the results in time order.
+
+    `handler` is called once per fetched window with the open response and
+    must be safe to call from worker threads.
+    """
+    windows = split_time_range(start, end, window)
+    logger.info(
+        f"Fetching {len(windows)} windows from {start} to {end} "
+        f"with {max_workers} workers"
+    )
+
+    session = create_session(max_workers)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    fetch_adaptive, session, s, e, handler, params, url, cache
+                )
+                for s, e in windows
+            ]
+            # Windows were submitted in time order, so collecting the futures
+            # in submission order keeps the merged results sorted
+            results = []
+            for future in futures:
+                results.extend(future.result())
+    finally:
+        session.close()
+
+    return results
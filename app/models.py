@@ -4,8 +4,13 @@ from sqlalchemy import (
     String,
     Float,
     BigInteger,
+    Date,
     DateTime,
+    Computed,
+    ForeignKey,
+    Index,
     func,
+    text,
 )
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import load_dotenv
@@ -16,29 +21,56 @@ load_dotenv()
 # Create the base class for declarative models
 Base = declarative_base()
 
+# Id of the writing transaction, which earthquakes.change_xid records for
+# every inserted or rewritten row
+CURRENT_XID_SQL = "pg_current_xact_id()::text::bigint"
+
 
 class Earthquake(Base):
     __tablename__ = "earthquakes"
+    __table_args__ = (
+        Index("ix_earthquakes_event_time_brin", "event_time", postgresql_using="brin"),
+    )
 
     id = Column(Integer, primary_key=True)
-    time = Column(BigInteger)
+    event_id = Column(String, unique=True, index=True)
+    time = Column(BigInteger, index=True)
+    updated = Column(BigInteger)
     place = Column(String)
     magnitude = Column(Float)
     longitude = Column(Float)
     latitude = Column(Float)
     depth = Column(Float)
     file_name = Column(String)
+    # Event time as a timestamp, derived from the millisecond `time`
+    event_time = Column(
+        DateTime(timezone=True), Computed("to_timestamp(time / 1000.0)")
+    )
+    # Transaction that last wrote the row, for incremental transforms
+    change_xid = Column(BigInteger, server_default=text(CURRENT_XID_SQL), index=True)
 
     def __repr__(self):
         return f"<Earthquake(time={self.time}, place='{self.place}', magnitude={self.magnitude})>"
 
 
+class Region(Base):
+    __tablename__ = "regions"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255), nullable=False, unique=True)
+
+    def __repr__(self):
+        return f"<Region(id={self.id}, name='{self.name}')>"
+
+
 class StageEarthquake(Base):
     __tablename__ = "stage_earthquakes"
+    # Monthly partitions are created and retired by app.etl.stage_partitions
+    __table_args__ = {"postgresql_partition_by": "RANGE (dt)"}
 
-    id = Column(Integer, primary_key=True)
-    dt = Column(DateTime, index=True)
-    region = Column(String(255))
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    dt = Column(DateTime, primary_key=True, index=True)
+    region_id = Column(Integer, ForeignKey("regions.id"), index=True)
     place = Column(String(255))
     magnitude = Column(Float)
     latitude = Column(Float)
@@ -46,6 +78,95 @@ class StageEarthquake(Base):
     depth = Column(Float)
     raw_time = Column(BigInteger)
     created_at = Column(DateTime, default=func.now())
+    earthquake_id = Column(Integer, index=True)
 
     def __repr__(self):
         return f"<StageEarthquake(dt={self.dt}, place='{self.place}', magnitude={self.magnitude})>"
+
+
+class LoadCheckpoint(Base):
+    __tablename__ = "load_checkpoints"
+
+    file_name = Column(String, primary_key=True)
+    signature = Column(String)
+    rows_loaded = Column(BigInteger)
+    updated_at = Column(DateTime, default=func.now())
+
+    def __repr__(self):
+        return f"<LoadCheckpoint(file_name='{self.file_name}', rows_loaded={self.rows_loaded})>"
+
+
+class LoadManifest(Base):
+    __tablename__ = "load_manifest"
+
+    checksum = Column(String(64), primary_key=True)
+    file_name = Column(String)
+    file_size = Column(BigInteger)
+    loaded_at = Column(DateTime, default=func.now())
+
+    def __repr__(self):
+        return (
+            f"<LoadManifest(file_name='{self.file_name}', checksum='{self.checksum}')>"
+        )
+
+
+class TransformCheckpoint(Base):
+    __tablename__ = "transform_checkpoints"
+
+    name = Column(String, primary_key=True)
+    change_xid = Column(BigInteger)
+    rows_transformed = Column(BigInteger)
+    updated_at = Column(DateTime, default=func.now())
+
+    def __repr__(self):
+        return (
+            f"<TransformCheckpoint(name='{self.name}', change_xid={self.change_xid})>"
+        )
+
+
+class StatsDaily(Base):
+    __tablename__ = "stats_daily"
+
+    day = Column(Date, primary_key=True)
+    event_count = Column(BigInteger, nullable=False)
+    magnitude_count = Column(BigInteger, nullable=False)
+    magnitude_sum = Column(Float)
+    magnitude_min = Column(Float)
+    magnitude_max = Column(Float)
+    depth_count = Column(BigInteger, nullable=False)
+    depth_sum = Column(Float)
+    first_dt = Column(DateTime)
+    last_dt = Column(DateTime)
+
+    def __repr__(self):
+        return f"<StatsDaily(day={self.day}, event_count={self.event_count})>"
+
+
+class StatsRegionDaily(Base):
+    __tablename__ = "stats_region_daily"
+
+    day = Column(Date, primary_key=True)
+    region_id = Column(Integer, ForeignKey("regions.id"), primary_key=True)
+    event_count = Column(BigInteger, nullable=False)
+
+    def __repr__(self):
+        return (
+            f"<StatsRegionDaily(day={self.day}, region_id={self.region_id}, "
+            f"event_count={self.event_count})>"
+        )
+
+
+class StatsMagnitudeBin(Base):
+    __tablename__ = "stats_magnitude_bins"
+
+    day = Column(Date, primary_key=True)
+    # Magnitudes from bin * width up to (bin + 1) * width, the width being
+    # MAGNITUDE_BIN_WIDTH of app.etl.stage_rollups
+    bin = Column(Integer, primary_key=True)
+    event_count = Column(BigInteger, nullable=False)
+
+    def __repr__(self):
+        return (
+            f"<StatsMagnitudeBin(day={self.day}, bin={self.bin}, "
+            f"event_count={self.event_count})>"
+        )
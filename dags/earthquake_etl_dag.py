@@ -7,6 +7,11 @@ from airflow.operators.python import PythonOperator
 from airflow.operators.bash import BashOperator
 from airflow.utils.dates import days_ago
 
+# Make the app package importable from the Python tasks
+AIRFLOW_HOME = os.getenv("AIRFLOW_HOME", "/opt/airflow")
+if AIRFLOW_HOME not in sys.path:
+    sys.path.append(AIRFLOW_HOME)
+
 # Default arguments for the DAG
 default_args = {
     "owner": "airflow",
@@ -48,6 +53,13 @@ load_task = BashOperator(
     dag=dag,
 )
 
+# Create upcoming stage_earthquakes partitions and retire expired ones
+partition_task = BashOperator(
+    task_id="maintain_stage_partitions",
+    bash_command="cd /opt/airflow && python -m app.etl.stage_partitions",
+    dag=dag,
+)
+
 transform_task = BashOperator(
     task_id="transform_data",
     bash_command="cd /opt/airflow && python -m app.etl.transform_data",
@@ -62,6 +74,7 @@ def generate_earthquake_visualizations():
     import os
     import sys
     from datetime import datetime
+    from html import escape
 
     # Create directory and initialize logging
     viz_dir = "/opt/airflow/data/visualizations"
@@ -75,236 +88,108 @@ def generate_earthquake_visualizations():
     log_debug("Starting visualization generation")
 
     try:
-        # Import required libraries
-        log_debug("Importing visualization libraries")
-        import matplotlib
-
-        matplotlib.use("Agg")  # Use non-interactive backend
-        import matplotlib.pyplot as plt
-        import matplotlib.cm as cm
-        import numpy as np
-
-        log_debug(f"Using matplotlib version: {matplotlib.__version__}")
-
-        log_debug("Importing folium")
-        import folium
-        from folium.plugins import HeatMap, MarkerCluster, MeasureControl
-
         # Connect to database
         log_debug("Connecting to database")
-        import psycopg2
-
-        db_params = {
-            "dbname": os.getenv("DB_NAME", "earthquake_db"),
-            "user": os.getenv("DB_USER", "postgres"),
-            "password": os.getenv("DB_PASS", "postgres"),
-            "host": os.getenv("DB_HOST", "postgres"),
-            "port": os.getenv("DB_PORT", "5432"),
-        }
-        log_debug(f"Database parameters: {db_params}")
-
-        conn = psycopg2.connect(**db_params)
-        log_debug("Successfully connected to database")
-
-        # Query data - limit to 500 for performance
-        query = """
-        SELECT dt, region, place, magnitude, latitude, longitude, depth
-        FROM stage_earthquakes
-        ORDER BY dt DESC
-        LIMIT 500
-        """
-
-        log_debug("Executing query")
-        df = pd.read_sql(query, conn)
-        conn.close()
-        log_debug(f"Retrieved {len(df)} earthquake records")
-
-        # 1. Create enhanced magnitude distribution histogram
-        log_debug("Creating magnitude histogram")
-        plt.figure(figsize=(10, 6))
-        bins = np.linspace(df["magnitude"].min(), df["magnitude"].max(), 20)
-        plt.hist(
-            df["magnitude"], bins=bins, color="skyblue", edgecolor="black", alpha=0.7
-        )
-        plt.title("Earthquake Magnitude Distribution", fontsize=16)
-        plt.xlabel("Magnitude", fontsize=14)
-        plt.ylabel("Frequency", fontsize=14)
-        plt.grid(True, alpha=0.3, linestyle="--")
-
-        # Add mean and median lines
-        mean_mag = df["magnitude"].mean()
-        median_mag = df["magnitude"].median()
-        plt.axvline(mean_mag, color="r", linestyle="--", label=f"Mean: {mean_mag:.2f}")
-        plt.axvline(
-            median_mag, color="g", linestyle="--", label=f"Median: {median_mag:.2f}"
-        )
-        plt.legend()
-
-        plt.savefig(
-            f"{viz_dir}/magnitude_distribution.png", dpi=300, bbox_inches="tight"
-        )
-        plt.close()
-        log_debug("Completed magnitude histogram")
-
-        # 2. Create enhanced time series of earthquake counts
-        log_debug("Creating time series chart")
-        df["date"] = df["dt"].dt.date
-        daily_counts = df.groupby("date").size().reset_index(name="count")
-
-        plt.figure(figsize=(12, 6))
-        plt.plot(
-            daily_counts["date"],
-            daily_counts["count"],
-            marker="o",
-            linestyle="-",
-            linewidth=2,
-            markersize=8,
-            color="#1f77b4",
-        )
-
-        # Add 3-day moving average
-        if len(daily_counts) >= 3:
-            daily_counts["moving_avg"] = daily_counts["count"].rolling(window=3).mean()
-            plt.plot(
-                daily_counts["date"],
-                daily_counts["moving_avg"],
-                color="red",
-                linestyle="--",
-                linewidth=2,
-                label="3-day Moving Average",
-            )
-            plt.legend()
-
-        plt.title("Daily Earthquake Counts", fontsize=16)
-        plt.xlabel("Date", fontsize=14)
-        plt.ylabel("Number of Earthquakes", fontsize=14)
-        plt.grid(True, alpha=0.3, linestyle="--")
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-
-        # Add annotations for days with highest counts
-        if not daily_counts.empty:
-            max_count_idx = daily_counts["count"].idxmax()
-            max_date = daily_counts.loc[max_count_idx, "date"]
-            max_count = daily_counts.loc[max_count_idx, "count"]
-            plt.annotate(
-                f"Peak: {max_count}",
-                xy=(max_date, max_count),
-                xytext=(0, 20),
-                textcoords="offset points",
-                arrowprops=dict(arrowstyle="->", color="black"),
-                ha="center",
-            )
-
-        plt.savefig(f"{viz_dir}/daily_counts.png", dpi=300, bbox_inches="tight")
-        plt.close()
-        log_debug("Completed time series chart")
-
-        # 3. Create enhanced depth vs magnitude scatter plot
-        log_debug("Creating depth vs magnitude plot")
-        plt.figure(figsize=(10, 6))
-
-        # Create a colormap based on depth
-        scatter = plt.scatter(
-            df["depth"],
-            df["magnitude"],
-            alpha=0.7,
-            c=df["depth"],
-            s=df["magnitude"] * 20,  # Size based on magnitude
-            cmap="viridis",
-        )
-
-        cbar = plt.colorbar(scatter, label="Depth (km)")
-        plt.title("Earthquake Depth vs Magnitude", fontsize=16)
-        plt.xlabel("Depth (km)", fontsize=14)
-        plt.ylabel("Magnitude", fontsize=14)
-        plt.grid(True, alpha=0.3, linestyle="--")
-
-        # Add regression line
-        try:
-            from scipy import stats
-
-            if len(df) > 1:
-                slope, intercept, r_value, p_value, std_err = stats.linregress(
-                    df["depth"], df["magnitude"]
+        from app.data.utils import get_connection
+        from app.etl import dashboard_data
+        from app.etl.dashboard_render import RENDERERS, render_artifacts
+        from app.etl.stage_rollups import read_summary, top_regions
+
+        # Every chart is aggregated in PostgreSQL over all staged events, so
+        # only the aggregates travel; the map markers show the latest events
+        map_events = int(os.getenv("DASHBOARD_MAP_EVENTS", "5000"))
+        heat_cell = float(os.getenv("DASHBOARD_HEAT_CELL_DEGREES", "1.0"))
+        # Processes rendering the charts and the map side by side
+        default_workers = min(4, os.cpu_count() or 1)
+        workers = int(os.getenv("DASHBOARD_WORKERS", str(default_workers)))
+
+        log_debug("Executing queries")
+        with get_connection() as conn:
+            log_debug("Successfully connected to database")
+            # Summary statistics of every staged event, from the daily rollups
+            summary = read_summary(conn)
+            if summary is not None:
+                most_active = top_regions(conn)
+                edges, histogram = dashboard_data.magnitude_histogram(conn)
+                median_mag = dashboard_data.magnitude_median(conn)
+                period = dashboard_data.count_period(
+                    summary["earliest_date"], summary["latest_date"]
                 )
-                x_line = np.array([df["depth"].min(), df["depth"].max()])
-                y_line = slope * x_line + intercept
-                plt.plot(
-                    x_line,
-                    y_line,
-                    color="red",
-                    linestyle="--",
-                    label=f"Regression (r²={r_value**2:.2f})",
-                )
-                plt.legend()
-        except ImportError:
-            log_debug("scipy not available for regression line - skipping")
-
-        plt.savefig(f"{viz_dir}/depth_vs_magnitude.png", dpi=300, bbox_inches="tight")
-        plt.close()
-        log_debug("Completed depth vs magnitude plot")
-
-        # 4. Create an enhanced interactive map
-        log_debug("Creating interactive map")
-        # Start map centered at median location
-        center_lat = df["latitude"].median()
-        center_lon = df["longitude"].median()
-        m = folium.Map(
-            location=[center_lat, center_lon], zoom_start=3, tiles="CartoDB positron"
-        )
+                daily_counts = dashboard_data.event_counts(conn, period)
+                depth_grid = dashboard_data.depth_magnitude_grid(conn)
+                regression = dashboard_data.depth_magnitude_regression(conn)
+                heat_grid = dashboard_data.density_grid(conn, heat_cell)
+                df = dashboard_data.latest_events(conn, map_events)
+
+        failures = {}
+        if summary is None:
+            # Nothing staged yet, or everything aged out by retention
+            log_debug("No staged earthquakes, skipping the charts and the map")
+            most_active = []
+            failures = {artifact: "no staged earthquakes" for artifact in RENDERERS}
+            results = []
+        else:
+            log_debug(
+                f"Aggregated {summary['total_earthquakes']} earthquakes into "
+                f"{len(histogram)} bins, {len(daily_counts)} {period}s, "
+                f"{len(depth_grid)} depth cells and {len(heat_grid)} map cells; "
+                f"retrieved {len(df)} earthquake records for markers"
+            )
 
-        # Add measure tool
-        m.add_child(MeasureControl())
-
-        # Add a heatmap layer
-        heat_data = [
-            [row["latitude"], row["longitude"], row["magnitude"]]
-            for _, row in df.iterrows()
-        ]
-        HeatMap(
-            heat_data,
-            radius=15,
-            blur=10,
-            gradient={0.4: "blue", 0.65: "lime", 0.9: "orange", 1: "red"},
-        ).add_to(m)
-
-        # Create a separate layer for markers
-        marker_cluster = MarkerCluster(name="Earthquakes").add_to(m)
-
-        # Add markers for each earthquake
-        for _, row in df.iterrows():
-            popup_text = f"""
-            <b>Location:</b> {row['place']}<br>
-            <b>Region:</b> {row['region']}<br>
-            <b>Date:</b> {row['dt']}<br>
-            <b>Magnitude:</b> {row['magnitude']}<br>
-            <b>Depth:</b> {row['depth']} km
-            """
-
-            # Determine marker color and size based on magnitude
-            if row["magnitude"] < 2.0:
-                color = "green"
-            elif row["magnitude"] < 4.0:
-                color = "orange"
+            # Render the charts and the map, each as its own job sharing the
+            # query results through memory-mapped files; a failed artifact is
+            # reported in its place on the dashboard
+            log_debug(f"Rendering visualizations with {workers} processes")
+            results = render_artifacts(
+                viz_dir,
+                datasets={
+                    "magnitude_edges": edges,
+                    "magnitude_counts": histogram,
+                    "event_counts": daily_counts,
+                    "depth_grid": depth_grid,
+                    "heat_grid": heat_grid,
+                    "events": df,
+                },
+                jobs={
+                    "magnitude_distribution.png": {
+                        "mean": summary["avg_magnitude"],
+                        "median": median_mag,
+                    },
+                    "daily_counts.png": {"period": period},
+                    "depth_vs_magnitude.png": {"regression": regression},
+                    "earthquake_map.html": {},
+                },
+                workers=workers,
+            )
+        for result in results:
+            if result["error"]:
+                failures[result["artifact"]] = result["error"]
+                log_debug(f"Failed to render {result['artifact']}: {result['error']}")
             else:
-                color = "red"
-
-            # Create custom icon with size based on magnitude
-            icon = folium.Icon(color=color, icon="bolt", prefix="fa")
-
-            folium.Marker(
-                location=[row["latitude"], row["longitude"]],
-                popup=folium.Popup(popup_text, max_width=300),
-                icon=icon,
-            ).add_to(marker_cluster)
+                log_debug(
+                    f"Rendered {result['artifact']} in {result['seconds']}s "
+                    f"(pid {result['pid']})"
+                )
 
-        # Add layer control
-        folium.LayerControl().add_to(m)
+        def summary_value(key, spec=".2f", suffix=""):
+            if summary is None or summary[key] is None:
+                return "No data"
+            return f"{summary[key]:{spec}}{suffix}"
+
+        if summary is None:
+            date_range = "No data"
+        else:
+            date_range = (
+                f"{summary['earliest_date']:%Y-%m-%d} to "
+                f"{summary['latest_date']:%Y-%m-%d}"
+            )
 
-        # Save the map
-        m.save(f"{viz_dir}/earthquake_map.html")
-        log_debug("Completed interactive map")
+        def artifact_html(artifact, element):
+            if artifact in failures:
+                return (
+                    f'<p class="error">Not available: {escape(failures[artifact])}</p>'
+                )
+            return element
 
         # 5. Create enhanced HTML dashboard
         log_debug("Creating dashboard HTML")
@@ -329,6 +214,7 @@ def generate_earthquake_visualizations():
                 th, td {{ padding: 10px; text-align: left; border-bottom: 1px solid #ddd; }}
                 th {{ background-color: #f2f2f2; }}
                 tr:hover {{ background-color: #f5f5f5; }}
+                .error {{ color: #c0392b; padding: 10px; }}
             </style>
         </head>
         <body>
@@ -341,18 +227,18 @@ def generate_earthquake_visualizations():
                 <div class="viz-row">
                     <div class="viz-item">
                         <h2>Magnitude Distribution</h2>
-                        <img src="magnitude_distribution.png" alt="Magnitude Distribution">
+                        {artifact_html("magnitude_distribution.png", '<img src="magnitude_distribution.png" alt="Magnitude Distribution">')}
                     </div>
                     <div class="viz-item">
                         <h2>Daily Earthquake Counts</h2>
-                        <img src="daily_counts.png" alt="Daily Earthquake Counts">
+                        {artifact_html("daily_counts.png", '<img src="daily_counts.png" alt="Daily Earthquake Counts">')}
                     </div>
                 </div>
                 
                 <div class="viz-row">
                     <div class="viz-item">
                         <h2>Depth vs Magnitude</h2>
-                        <img src="depth_vs_magnitude.png" alt="Depth vs Magnitude">
+                        {artifact_html("depth_vs_magnitude.png", '<img src="depth_vs_magnitude.png" alt="Depth vs Magnitude">')}
                     </div>
                     <div class="viz-item">
                         <h2>Summary Statistics</h2>
@@ -363,31 +249,31 @@ def generate_earthquake_visualizations():
                             </tr>
                             <tr>
                                 <td>Total Earthquakes</td>
-                                <td>{len(df)}</td>
+                                <td>{summary_value('total_earthquakes', 'd')}</td>
                             </tr>
                             <tr>
                                 <td>Average Magnitude</td>
-                                <td>{df['magnitude'].mean():.2f}</td>
+                                <td>{summary_value('avg_magnitude')}</td>
                             </tr>
                             <tr>
                                 <td>Max Magnitude</td>
-                                <td>{df['magnitude'].max():.2f}</td>
+                                <td>{summary_value('max_magnitude')}</td>
                             </tr>
                             <tr>
                                 <td>Min Magnitude</td>
-                                <td>{df['magnitude'].min():.2f}</td>
+                                <td>{summary_value('min_magnitude')}</td>
                             </tr>
                             <tr>
                                 <td>Average Depth</td>
-                                <td>{df['depth'].mean():.2f} km</td>
+                                <td>{summary_value('avg_depth', suffix=' km')}</td>
                             </tr>
                             <tr>
                                 <td>Date Range</td>
-                                <td>{df['dt'].min().strftime('%Y-%m-%d')} to {df['dt'].max().strftime('%Y-%m-%d')}</td>
+                                <td>{date_range}</td>
                             </tr>
                             <tr>
                                 <td>Regions with Most Activity</td>
-                                <td>{', '.join(df['region'].value_counts().head(3).index.tolist())}</td>
+                                <td>{', '.join(most_active) or 'No data'}</td>
                             </tr>
                         </table>
                     </div>
@@ -396,7 +282,7 @@ def generate_earthquake_visualizations():
                 <div class="viz-row">
                     <div class="viz-item full-width">
                         <h2>Interactive Earthquake Map</h2>
-                        <iframe src="earthquake_map.html"></iframe>
+                        {artifact_html("earthquake_map.html", '<iframe src="earthquake_map.html"></iframe>')}
                     </div>
                 </div>
             </div>
@@ -438,4 +324,11 @@ visualization_task = PythonOperator(
 )
 
 # Set up task dependencies
-run_migrations >> extract_task >> load_task >> transform_task >> visualization_task
+(
+    run_migrations
+    >> extract_task
+    >> load_task
+    >> partition_task
+    >> transform_task
+    >> visualization_task
+)
@@ -0,0 +1,63 @@
+import os
+import time
+import uuid
+
+import psycopg2
+import pytest
+from sqlalchemy import create_engine
+
+from app.data import utils
+from app.data.utils import get_database_url
+from app.models import Base
+
+
+@pytest.fixture
+def utc(monkeypatch):
+    """Run the test with the process time zone set to UTC."""
+    monkeypatch.setenv("TZ", "UTC")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.fixture
+def db_conn(utc, monkeypatch):
+    """A psycopg2 connection to a throwaway schema holding the app's tables.
+
+    The shared engine of app.data.utils is pointed at the same schema, and
+    the session time zone is UTC, like the process's. The test is skipped
+    when no database is reachable with the DB_* settings.
+    """
+    url = get_database_url()
+    try:
+        admin = psycopg2.connect(url, connect_timeout=3)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"No database reachable: {e}")
+    admin.autocommit = True
+
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    options = f"-c search_path={schema} -c TimeZone=UTC"
+    admin.cursor().execute(f"CREATE SCHEMA {schema}")
+    try:
+        engine = create_engine(url, connect_args={"options": options})
+        Base.metadata.create_all(engine)
+        monkeypatch.setattr(utils, "_engine", engine)
+        monkeypatch.setattr(utils, "_engine_pid", os.getpid())
+
+        conn = psycopg2.connect(url, options=options)
+        cur = conn.cursor()
+        cur.execute(
+            "CREATE TABLE stage_earthquakes_default "
+            "PARTITION OF stage_earthquakes DEFAULT"
+        )
+        conn.commit()
+        cur.close()
+        try:
+            yield conn
+        finally:
+            conn.close()
+            engine.dispose()
+    finally:
+        admin.cursor().execute(f"DROP SCHEMA {schema} CASCADE")
+        admin.close()
@@ -0,0 +1,29 @@
+from datetime import date, datetime
+
+import pytest
+
+from app.etl.check_query_plans import QUERIES, STAGE_QUERIES, check_plan, check_pruning
+from app.etl.stage_partitions import create_partition
+from app.etl.transform_data import xid_horizon
+
+RANGE = (datetime(2024, 3, 1), datetime(2024, 3, 16))
+
+
+@pytest.mark.parametrize("name", list(QUERIES))
+def test_transform_query_uses_an_index_on_earthquakes(db_conn, name):
+    query, column = QUERIES[name]
+    params = RANGE if column == "time" else (xid_horizon(db_conn),)
+    db_conn.rollback()
+
+    assert check_plan(db_conn, query, params, column) == []
+
+
+@pytest.mark.parametrize("name", list(STAGE_QUERIES))
+def test_stage_query_only_scans_the_partitions_of_its_range(db_conn, name):
+    cur = db_conn.cursor()
+    for month in (date(2024, 2, 1), date(2024, 3, 1), date(2024, 4, 1)):
+        create_partition(cur, month)
+    db_conn.commit()
+    cur.close()
+
+    assert check_pruning(db_conn, STAGE_QUERIES[name], RANGE) == []
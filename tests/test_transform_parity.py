@@ -0,0 +1,84 @@
+import random
+from datetime import datetime, timezone
+
+import pytest
+
+from app.etl.transform_data import transform_earthquake, transform_earthquake_sql
+
+START_DATE, END_DATE = "2024-03-01", "2024-03-05"
+
+PLACES = [
+    "10 km NE of Ridgecrest, CA",
+    " 3 km S of Volcano, Hawaii ",
+    "5 km N of Town of Yucca Valley, CA",
+    "Central Alaska",
+    "South of the Fiji Islands",
+    "Off the coast of Oregon, USA",
+    "Kermadec Islands, New Zealand",
+    "Pacific-Antarctic Ridge",
+    "",
+    None,
+]
+
+
+def seed_earthquakes(conn, rows=500, seed=7):
+    """Insert reproducible earthquakes, some just outside the transformed range."""
+    rng = random.Random(seed)
+    first = int(datetime(2024, 2, 29, 18, tzinfo=timezone.utc).timestamp() * 1000)
+    last = int(datetime(2024, 3, 6, 6, tzinfo=timezone.utc).timestamp() * 1000)
+    cur = conn.cursor()
+    for n in range(rows):
+        time_ms = rng.randint(first, last)
+        cur.execute(
+            """
+            INSERT INTO earthquakes (
+                event_id, time, updated, place, magnitude, latitude, longitude, depth
+            )
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            (
+                f"us{n:06d}",
+                time_ms,
+                time_ms + rng.randint(0, 86_400_000),
+                rng.choice(PLACES),
+                rng.choice([None, -0.0, round(rng.uniform(-1, 7), 2)]),
+                rng.uniform(-90, 90),
+                rng.uniform(-180, 180),
+                rng.choice([None, round(rng.uniform(0, 700), 3)]),
+            ),
+        )
+    conn.commit()
+    cur.close()
+
+
+def staged_rows(conn):
+    """Return the stage rows, with region names for ids, then empty the stage."""
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT dt, r.name, s.place, s.magnitude + 0.0, s.latitude, s.longitude,
+               s.depth, s.raw_time, e.event_id
+        FROM stage_earthquakes s
+        LEFT JOIN regions r ON r.id = s.region_id
+        JOIN earthquakes e ON e.id = s.earthquake_id
+        ORDER BY e.event_id
+        """)
+    rows = cur.fetchall()
+    cur.execute(
+        "TRUNCATE stage_earthquakes, regions, stats_daily, stats_region_daily, "
+        "stats_magnitude_bins"
+    )
+    conn.commit()
+    cur.close()
+    return rows
+
+
+def test_sql_and_python_transforms_stage_the_same_rows(db_conn):
+    seed_earthquakes(db_conn)
+
+    sql_count = transform_earthquake_sql(db_conn, START_DATE, END_DATE)
+    sql_rows = staged_rows(db_conn)
+    python_count = transform_earthquake(db_conn, START_DATE, END_DATE)
+    python_rows = staged_rows(db_conn)
+
+    assert sql_count == python_count == len(sql_rows) > 0
+    assert python_rows == sql_rows
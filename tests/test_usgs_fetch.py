@@ -0,0 +1,94 @@
+import json
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from app.etl.usgs_fetch import fetch_time_range
+
+START = datetime(2024, 1, 1)
+
+# Stand-in for the 20,000-event cap, small enough to force several halvings
+CAP = 5
+
+# One event every 72 minutes over two days
+EVENTS = [
+    {
+        "type": "Feature",
+        "id": f"us{i}",
+        "properties": {
+            "time": int((START + timedelta(minutes=72 * i)).timestamp() * 1000)
+        },
+    }
+    for i in range(40)
+]
+
+
+class StubUSGSHandler(BaseHTTPRequestHandler):
+    """Answers FDSN queries from EVENTS, rejecting windows over CAP like USGS."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        start = datetime.fromisoformat(query["starttime"]).timestamp() * 1000
+        end = datetime.fromisoformat(query["endtime"]).timestamp() * 1000
+        self.server.windows.append((query["starttime"], query["endtime"]))
+
+        features = [f for f in EVENTS if start <= f["properties"]["time"] <= end]
+        if len(features) > CAP:
+            self.send_response(400)
+            self.end_headers()
+            self.wfile.write(
+                b"Error 400: Bad Request\n\n"
+                b"20001 matching events exceeds search limit of 20000."
+            )
+            return
+
+        body = json.dumps({"type": "FeatureCollection", "features": features})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+
+@pytest.fixture
+def usgs_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubUSGSHandler)
+    server.windows = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/query", server.windows
+    server.shutdown()
+    server.server_close()
+
+
+def event_ids(response):
+    return [feature["id"] for feature in response.json()["features"]]
+
+
+def test_windows_over_the_cap_are_halved(usgs_url):
+    url, windows = usgs_url
+    fetch_time_range(
+        START, START + timedelta(days=2), event_ids, max_workers=2, url=url
+    )
+
+    # Each one-day window is rejected, then retried as two half windows
+    assert ("2024-01-01T00:00:00.000", "2024-01-01T23:59:59.999") in windows
+    assert ("2024-01-01T00:00:00.000", "2024-01-01T11:59:59.999") in windows
+    assert ("2024-01-01T12:00:00.000", "2024-01-01T23:59:59.999") in windows
+
+
+def test_results_are_merged_in_time_order(usgs_url):
+    url, _ = usgs_url
+    results = fetch_time_range(
+        START, START + timedelta(days=2), event_ids, max_workers=4, url=url
+    )
+
+    assert all(len(ids) <= CAP for ids in results)
+    assert [event_id for ids in results for event_id in ids] == [
+        event["id"] for event in EVENTS
+    ]